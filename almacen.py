@@ -0,0 +1,195 @@
+"""
+Almacén columnar en disco (Arrow IPC sin comprimir, mapeable en memoria)
+con las hojas de datos, el vocabulario de tokens y un manifiesto de versión.
+Posts y Comentarios se guardan particionados por mes de Fecha_Publicación
+(<hoja>/<AAAA-MM>/parte-NNNNN.arrow), de modo que añadir datos nuevos solo
+escribe archivos nuevos.
+"""
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pyarrow import feather
+from typing import Dict, List, Optional, Tuple
+
+DIR_SNAPSHOT = "datasets/snapshot"
+HOJAS = ("Metadata", "Posts", "Comentarios")
+HOJAS_PARTICIONADAS = ("Posts", "Comentarios")
+COLUMNA_PARTICION = "Fecha_Publicación"
+SIN_FECHA = "sin_fecha"
+VERSION_SNAPSHOT = 6
+
+
+def ruta_snapshot(nombre: str) -> str:
+    return os.path.join(DIR_SNAPSHOT, nombre)
+
+
+def ruta_tabla(nombre: str) -> str:
+    return ruta_snapshot(f"{nombre}.arrow")
+
+
+def partes_tabla(nombre: str) -> List[str]:
+    """
+    Archivos de una tabla particionada, en orden de mes y de escritura. Este
+    orden define las posiciones de fila, comunes a todas las columnas.
+    """
+    directorio = ruta_snapshot(nombre)
+    if not os.path.isdir(directorio):
+        return []
+    return [
+        os.path.join(directorio, mes, parte)
+        for mes in sorted(os.listdir(directorio)) if os.path.isdir(os.path.join(directorio, mes))
+        for parte in sorted(os.listdir(os.path.join(directorio, mes))) if parte.endswith(".arrow")
+    ]
+
+
+def estado_partes(nombre: str) -> Dict[str, Tuple[int, int]]:
+    """
+    Parte -> (mtime_ns, tamaño) de una tabla particionada. Permite saber qué
+    partes son nuevas respecto a un estado anterior (las de un anexo) y
+    detectar las que se reescribieron.
+    """
+    estado = {}
+    for parte in partes_tabla(nombre):
+        info = os.stat(parte)
+        estado[parte] = (info.st_mtime_ns, info.st_size)
+    return estado
+
+
+def existe_tabla(nombre: str) -> bool:
+    return os.path.exists(ruta_tabla(nombre)) or bool(partes_tabla(nombre))
+
+
+def leer_manifiesto() -> dict:
+    try:
+        with open(ruta_snapshot("manifest.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def escribir_manifiesto(manifiesto: dict) -> None:
+    os.makedirs(DIR_SNAPSHOT, exist_ok=True)
+    ruta = ruta_snapshot("manifest.json")
+    with open(ruta + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, ensure_ascii=False, indent=2)
+    os.replace(ruta + ".tmp", ruta)
+
+
+def normalizar_para_arrow(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convierte a texto las columnas con tipos mezclados (p. ej. números y cadenas
+    en la misma columna del Excel), que Arrow no puede representar.
+    """
+    df = df.copy()
+    for col in df.columns[df.dtypes == object]:
+        if pd.api.types.infer_dtype(df[col], skipna=True).startswith("mixed"):
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def escribir_tabla(tabla: pa.Table, nombre: str) -> None:
+    os.makedirs(DIR_SNAPSHOT, exist_ok=True)
+    destino = ruta_tabla(nombre)
+    feather.write_feather(tabla, destino + ".tmp", compression="uncompressed")
+    os.replace(destino + ".tmp", destino)
+
+
+def convertir_fechas(fechas: pd.Series) -> pd.Series:
+    """
+    Fechas como datetime (NaT si no son válidas). Las partes escritas en
+    distintos momentos pueden guardar la fecha con formatos ISO distintos
+    (con o sin microsegundos), así que no se infiere un único formato; los
+    valores que no son ISO 8601 se interpretan uno a uno.
+    """
+    convertidas = pd.to_datetime(fechas, errors="coerce", format="ISO8601")
+    pendientes = convertidas.isna() & fechas.notna()
+    if pendientes.any():
+        convertidas[pendientes] = pd.to_datetime(fechas[pendientes], errors="coerce", format="mixed")
+    return convertidas
+
+
+def mes_particion(fechas: pd.Series) -> np.ndarray:
+    """
+    Clave de partición (AAAA-MM) de cada fila; las fechas nulas o no válidas
+    van a la partición SIN_FECHA.
+    """
+    meses = convertir_fechas(fechas).dt.strftime("%Y-%m")
+    return meses.fillna(SIN_FECHA).to_numpy(dtype=object)
+
+
+def _esquema_particionado(nombre: str, tabla: pa.Table) -> pa.Schema:
+    """
+    Esquema común de las partes: el de las ya escritas o, si no hay ninguna,
+    el del primer lote con los diccionarios decodificados y las columnas
+    vacías guardadas como texto.
+    """
+    partes = partes_tabla(nombre)
+    if partes:
+        return pa.ipc.open_file(pa.memory_map(partes[0])).schema
+    campos = []
+    for campo in tabla.schema:
+        tipo = campo.type.value_type if pa.types.is_dictionary(campo.type) else campo.type
+        campos.append(pa.field(campo.name, pa.string() if pa.types.is_null(tipo) else tipo))
+    return pa.schema(campos)
+
+
+def escribir_particionado(tabla: pa.Table, nombre: str, meses: np.ndarray, reemplazar: bool = False) -> List[str]:
+    """
+    Añade las filas de `tabla` a las particiones mensuales de `nombre` como
+    partes nuevas (las existentes no se reescriben). Dentro de cada mes se
+    conserva el orden de las filas. Con `reemplazar` se borra antes la tabla.
+    """
+    if reemplazar:
+        shutil.rmtree(ruta_snapshot(nombre), ignore_errors=True)
+    esquema = _esquema_particionado(nombre, tabla)
+    for campo in esquema:
+        if campo.name not in tabla.column_names:
+            tabla = tabla.append_column(campo.name, pa.nulls(tabla.num_rows, campo.type))
+    tabla = tabla.select(esquema.names).cast(esquema)
+
+    meses = np.asarray(meses, dtype=object)
+    escritas = []
+    # Una tabla vacía se guarda igualmente (sin filas) para que exista en el almacén
+    for mes in sorted(set(meses)) or [SIN_FECHA]:
+        directorio = os.path.join(ruta_snapshot(nombre), mes)
+        os.makedirs(directorio, exist_ok=True)
+        n = sum(parte.endswith(".arrow") for parte in os.listdir(directorio))
+        destino = os.path.join(directorio, f"parte-{n:05d}.arrow")
+        feather.write_feather(
+            tabla.take(np.flatnonzero(meses == mes).astype(np.int64)), destino + ".tmp", compression="uncompressed"
+        )
+        os.replace(destino + ".tmp", destino)
+        escritas.append(destino)
+    return escritas
+
+
+def columnas_tabla(nombre: str) -> List[str]:
+    partes = partes_tabla(nombre)
+    return pa.ipc.open_file(pa.memory_map(partes[0] if partes else ruta_tabla(nombre))).schema.names
+
+
+def leer_partes(partes: List[str], columnas: Optional[List[str]] = None) -> pa.Table:
+    return pa.concat_tables([feather.read_table(p, columns=columnas, memory_map=True) for p in partes])
+
+
+def leer_tabla(nombre: str, columnas: Optional[List[str]] = None) -> pa.Table:
+    """
+    Lee una tabla mapeada en memoria; las particionadas se concatenan (sin
+    copia, una parte por chunk) en el orden de partes_tabla.
+    """
+    partes = partes_tabla(nombre)
+    if not partes:
+        return feather.read_table(ruta_tabla(nombre), columns=columnas, memory_map=True)
+    return leer_partes(partes, columnas)
+
+
+def escribir_vocabulario(vocabulario) -> None:
+    escribir_tabla(pa.table({"Término": pa.array(list(vocabulario), type=pa.string())}), "vocabulario")
+
+
+def leer_vocabulario() -> np.ndarray:
+    return leer_tabla("vocabulario")["Término"].to_numpy(zero_copy_only=False)
+
@@ -0,0 +1,205 @@
+"""
+Plan de agregación del análisis en profundidad: las métricas que usan los
+apartados (sumas y medias por partido y comunidad autónoma, valores por
+político y conteos de tono) se calculan en una sola pasada agrupada por clave
+y se guardan por estado de filtros, en lugar de que cada gráfico repita su
+propio groupby sobre los mismos datos. Los conteos de tono salen de matrices
+enteras político x tono (y x tema) construidas una vez por versión a partir
+de los agregados de Posts del almacén.
+"""
+import numpy as np
+import pandas as pd
+import streamlit as st
+from typing import Dict, List, Optional, Tuple
+from data_loader import cargar_agregados, cargar_columnas, obtener_version_datos
+from esquema import TONOS, ordenar_categorias
+from ingesta import CLAVES_TEMA, PREFIJO_TONO
+from analisis_en_profundidad.ranking import OrdenesDescendentes, top_n
+
+CLAVES_AGRUPACION: List[str] = ["Partido", "Comunidad Autónoma"]
+METRICAS: List[str] = [
+    "Seguidores", "Posts", "Tasa_Posts_Año", "Tasa_Seguidores_Año", "Interacción", "Interacción_Relativa"
+]
+COLUMNAS_POLITICO: List[str] = ["ID_Político", "Nombre", "Partido", "Comunidad Autónoma"]
+AGREGACIONES: List[str] = ["sum", "mean"]
+
+
+class PlanAgregacion:
+    """
+    Métricas de los políticos seleccionados (con las columnas derivadas ya
+    calculadas, ver metricas.aplicar_metricas): la tabla por político y, para
+    cada clave de CLAVES_AGRUPACION, la suma y la media de cada métrica
+    calculadas en un único groupby. Con `ordenes` (órdenes precalculados
+    sobre toda la Metadata, cuyas posiciones de fila son las etiquetas de
+    df_metadata) el top-N de políticos no necesita ordenar la selección.
+    """
+
+    def __init__(self, df_metadata: pd.DataFrame, ordenes: Optional[OrdenesDescendentes] = None):
+        self.ordenes = ordenes
+        metricas = [m for m in METRICAS if m in df_metadata.columns]
+        self.grupos: Dict[str, pd.DataFrame] = {
+            clave: df_metadata.groupby(clave, observed=True)[metricas].agg(AGREGACIONES)
+            for clave in CLAVES_AGRUPACION
+        }
+        self.politicos = df_metadata[COLUMNAS_POLITICO + metricas].copy()
+
+    def por_grupo(self, clave: str, metrica: str, aggfunc: str = "mean") -> pd.DataFrame:
+        """
+        DataFrame [clave, metrica] con la agregación de la métrica por grupo
+        (la media es NaN en los grupos sin ningún valor).
+        """
+        return self.grupos[clave][(metrica, aggfunc)].rename(metrica).reset_index()
+
+    def top(
+        self,
+        entidad: str,
+        metrica: str,
+        n: int = 10,
+        aggfunc: str = "mean",
+        decimales: Optional[int] = None
+    ) -> pd.DataFrame:
+        """
+        Las n filas con mayor valor de la métrica, de mayor a menor. `entidad`
+        es "Político" (columnas Nombre, Partido y la métrica) o una clave de
+        CLAVES_AGRUPACION (la clave y la agregación `aggfunc`). Se ordena por
+        el valor redondeado a `decimales`, que es el que se muestra.
+        """
+        if entidad != "Político":
+            tabla = self.por_grupo(entidad, metrica, aggfunc)
+            if decimales is not None:
+                tabla[metrica] = tabla[metrica].round(decimales)
+            return tabla.iloc[top_n(tabla[metrica], n)]
+
+        tabla = self.politicos[["Nombre", "Partido", metrica]]
+        if self.ordenes is not None and self.ordenes.disponible(metrica, decimales):
+            top = tabla.loc[self.ordenes.top(metrica, n, self.politicos.index.to_numpy(), decimales)]
+        else:
+            top = tabla.iloc[top_n(tabla[metrica], n, decimales)]
+        return top if decimales is None else top.round({metrica: decimales})
+
+
+def _codificar(serie: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Códigos enteros (-1 para nulos) y valores, en el orden en que los
+    agruparía groupby: el de las categorías o el orden natural.
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.cat.codes.to_numpy(dtype=np.int64), np.asarray(serie.cat.categories, dtype=object)
+    codigos, valores = pd.factorize(serie, sort=True)
+    return codigos.astype(np.int64), np.asarray(valores, dtype=object)
+
+
+def _sumar_por_grupo(codigos: np.ndarray, matriz: np.ndarray, n_grupos: int) -> np.ndarray:
+    """
+    Suma las filas de `matriz` por grupo (producto por la matriz de
+    pertenencia grupo x fila, hecho con un único bincount).
+    """
+    columnas = matriz.shape[1]
+    indices = (codigos[:, None] * columnas + np.arange(columnas)).ravel()
+    return np.bincount(indices, weights=matriz.ravel(), minlength=n_grupos * columnas).reshape(n_grupos, columnas)
+
+
+def _formato_largo(matriz: np.ndarray, filas: np.ndarray, columna: str, tonos: np.ndarray, valor: str) -> pd.DataFrame:
+    """
+    Celdas no nulas de una matriz (fila x tono) como DataFrame
+    [columna, Tono, valor], ordenadas por fila y tono.
+    """
+    i, j = np.nonzero(matriz)
+    return pd.DataFrame({columna: filas[i], "Tono": tonos[j], valor: matriz[i, j]})
+
+
+class MatrizTono:
+    """
+    Conteos enteros de posts por político x tono y por político x tema x
+    tono. Las filas son las de Metadata (en su orden), de modo que la
+    selección de unos filtros son posiciones de fila. Se rellenan con los
+    agregados por delta del almacén (posts por tono de agregados_politico y
+    posts por tema y tono de agregados_tema), sin leer la hoja Posts; tonos
+    y temas siguen el orden de sus categorías en esquema.ESQUEMA.
+    """
+
+    def __init__(self, ids_metadata: pd.Series, por_politico: pd.DataFrame, por_tema: pd.DataFrame):
+        ids = pd.Index(ids_metadata.astype(object))
+        columnas = [col for col in por_politico.columns if col.startswith(PREFIJO_TONO)]
+        tonos = pd.Series([col[len(PREFIJO_TONO):] for col in columnas], dtype=object)
+        self.tonos = np.asarray(ordenar_categorias(tonos, TONOS), dtype=object)
+        self.temas = np.asarray(ordenar_categorias(por_tema["Tema"].astype(object), None), dtype=object)
+        n, n_tonos, n_temas = len(ids), len(self.tonos), len(self.temas)
+
+        filas = ids.get_indexer(por_politico["ID_Político"].astype(object))
+        validas = filas >= 0
+        self.conteos = np.zeros((n, n_tonos), dtype=np.int64)
+        self.conteos[filas[validas, None], pd.Index(self.tonos).get_indexer(tonos)] = (
+            por_politico[columnas].to_numpy(dtype=np.int64)[validas]
+        )
+
+        filas = ids.get_indexer(por_tema["ID_Político"].astype(object))
+        temas = pd.Index(self.temas).get_indexer(por_tema["Tema"].astype(object))
+        codigos_tono = pd.Index(self.tonos).get_indexer(por_tema["Tono"].astype(object))
+        validas = (filas >= 0) & (temas >= 0) & (codigos_tono >= 0)
+        self.conteos_tema = np.zeros((n, n_temas, n_tonos), dtype=np.int64)
+        self.conteos_tema[filas[validas], temas[validas], codigos_tono[validas]] = (
+            por_tema["Posts"].to_numpy(dtype=np.int64)[validas]
+        )
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _matriz_tono_version(version: str) -> MatrizTono:
+    return MatrizTono(
+        cargar_columnas("Metadata", ["ID_Político"])["ID_Político"],
+        cargar_agregados("agregados_politico"),
+        cargar_agregados("agregados_tema")
+    )
+
+
+def matriz_tono() -> MatrizTono:
+    """
+    Matrices de conteos de tono de todos los políticos, construidas una vez
+    por versión de los datos.
+    """
+    return _matriz_tono_version(obtener_version_datos())
+
+
+class ConteosTono:
+    """
+    Conteos de posts por tono de los políticos seleccionados: por político
+    (con su proporción), por comunidad autónoma y por tema. Se obtienen de
+    las filas seleccionadas de MatrizTono con sumas por grupo; solo aparecen
+    las combinaciones con algún post.
+    """
+
+    def __init__(self, df_metadata: pd.DataFrame, matriz: MatrizTono):
+        filas = df_metadata.index.to_numpy()
+        conteos = matriz.conteos[filas]
+        totales = conteos.sum(axis=1, keepdims=True)
+        self.proporciones = np.divide(conteos, totales, out=np.zeros(conteos.shape), where=totales > 0)
+        self.conteos = conteos
+        self.tonos = matriz.tonos
+        self.codigos_partido, self.partidos = _codificar(df_metadata["Partido"])
+
+        i, j = np.nonzero(conteos)
+        self.politico = df_metadata[COLUMNAS_POLITICO].iloc[i].reset_index(drop=True).assign(
+            Tono=self.tonos[j], Cantidad=conteos[i, j], Proporción=self.proporciones[i, j]
+        )
+
+        codigos, comunidades = _codificar(df_metadata["Comunidad Autónoma"])
+        con_ccaa = codigos >= 0
+        por_ccaa = _sumar_por_grupo(codigos[con_ccaa], conteos[con_ccaa], len(comunidades)).astype(np.int64)
+        self.ccaa = _formato_largo(por_ccaa, comunidades, "Comunidad Autónoma", self.tonos, "Cantidad")
+        self.ccaa["Total"] = por_ccaa.sum(axis=1)[np.nonzero(por_ccaa)[0]]
+        self.ccaa["Proporción"] = self.ccaa["Cantidad"] / self.ccaa["Total"]
+
+        self.tema = _formato_largo(matriz.conteos_tema[filas].sum(axis=0), matriz.temas, "Tema", self.tonos, "Cantidad")
+
+    def proporcion_partido(self) -> pd.DataFrame:
+        """
+        Proporción media de cada tono por partido: media de las proporciones
+        de sus políticos con algún post de ese tono.
+        """
+        con_partido = self.codigos_partido >= 0
+        codigos = self.codigos_partido[con_partido]
+        n = len(self.partidos)
+        suma = _sumar_por_grupo(codigos, self.proporciones[con_partido], n)
+        con_posts = _sumar_por_grupo(codigos, (self.conteos[con_partido] > 0).astype(float), n)
+        media = np.divide(suma, con_posts, out=np.zeros(suma.shape), where=con_posts > 0)
+        return _formato_largo(media, self.partidos, "Partido", self.tonos, "Proporción")
@@ -1,34 +1,50 @@
 import streamlit as st
-from collections import Counter
+import numpy as np
 import pandas as pd
 import plotly.express as px
-import ast
-from typing import List, Tuple, Dict
+from typing import List, Optional, Tuple, Dict
+from filtros import posts_y_comentarios
+from analisis_en_profundidad.documento_termino import MatrizDocumentoTermino, matrices_documento_termino
 
 
+def posiciones(df: pd.DataFrame) -> np.ndarray:
+    """
+    Posiciones de las filas de df en el dataset completo (su índice original),
+    que es como se alinean con las columnas de tokens codificadas.
+    """
+    return df.index.to_numpy()
+
 
-@st.cache_data
-def deserializar_columnas(df: pd.DataFrame, columnas: List[str]) -> pd.DataFrame:
+def contar_mas_frecuentes(matriz: MatrizDocumentoTermino, filas: np.ndarray, top_n: int = 20) -> List[Tuple[str, int]]:
     """
-    Convierte strings de listas en listas reales para las columnas indicadas.
+    Devuelve los términos más frecuentes con su frecuencia en las filas indicadas.
     """
-    for col in columnas:
-        if col in df.columns:
-            df[col] = df[col].dropna().apply(lambda x: ast.literal_eval(x) if isinstance(x, str) else x)
-    return df
+    return matriz.top(matriz.sumar_columnas(filas), top_n)
 
 
-def contar_mas_frecuentes(lista_columnas: pd.Series, top_n: int = 20) -> List[Tuple[str, int]]:
+def contar_por_categoria(
+    df: pd.DataFrame,
+    matriz: MatrizDocumentoTermino,
+    columna_categoria: str,
+    top_n: int = 20,
+    categorias: Optional[List[str]] = None
+) -> Dict[str, List[Tuple[str, int]]]:
     """
-    Devuelve los términos más frecuentes con su frecuencia, ignorando listas vacías o nulas.
+    Términos más frecuentes en las filas de df de cada valor de una columna
+    categórica (los presentes, en orden de aparición, o `categorias`). Las
+    frecuencias de todas las categorías salen de una sola suma agrupada
+    dispersa.
     """
-    elementos = [
-        item
-        for sublista in lista_columnas.dropna()
-        if isinstance(sublista, list) and sublista  
-        for item in sublista
-    ]
-    return Counter(elementos).most_common(top_n)
+    valores = df[columna_categoria].astype(object)
+    if categorias is None:
+        codigos, categorias = pd.factorize(valores)
+    else:
+        codigos = pd.Index(categorias, dtype=object).get_indexer(valores)
+    indptr, terminos, frecuencias = matriz.sumar_por_grupo(posiciones(df), codigos, len(categorias))
+    return {
+        cat: matriz.top(frecuencias[indptr[i]:indptr[i + 1]], top_n, terminos[indptr[i]:indptr[i + 1]])
+        for i, cat in enumerate(categorias)
+    }
 
 
 def graficar_top(counter_list: List[Tuple[str, int]], titulo: str) -> None:
@@ -59,28 +75,21 @@ def analizar_tokens_entidades(
     teniendo en cuenta los filtros aplicados.
     """
 
-    ids_filtrados = df_filtrado["ID_Político"].unique()
-    df_posts_filtrado = df_posts[df_posts["ID_Político"].isin(ids_filtrados)].copy()
-    enlaces_validos = df_posts_filtrado["Enlace_Post"].unique()
-    df_comentarios_filtrado = df_comentarios[df_comentarios["Enlace_Post"].isin(enlaces_validos)].copy()
+    df_posts_filtrado, df_comentarios_filtrado = posts_y_comentarios(df_filtrado, df_posts, df_comentarios)
 
-    columnas_posts = ["Corpus_Tokens", "Entidades"]
-    columnas_comentarios = [
-        "Corpus_Tokens_Comentarios", "Entidades_Comentarios",
-        "Corpus_Tokens_Respuestas", "Entidades_Respuestas"
-    ]
-    df_posts_filtrado = deserializar_columnas(df_posts_filtrado, columnas_posts)
-    df_comentarios_filtrado = deserializar_columnas(df_comentarios_filtrado, columnas_comentarios)
+    tokens = matrices_documento_termino()
+    filas_posts = posiciones(df_posts_filtrado)
+    filas_comentarios = posiciones(df_comentarios_filtrado)
 
     top_tokens = {
-        "Posts": contar_mas_frecuentes(df_posts_filtrado["Corpus_Tokens"]),
-        "Comentarios": contar_mas_frecuentes(df_comentarios_filtrado["Corpus_Tokens_Comentarios"]),
-        "Respuestas": contar_mas_frecuentes(df_comentarios_filtrado["Corpus_Tokens_Respuestas"])
+        "Posts": contar_mas_frecuentes(tokens["Corpus_Tokens"], filas_posts),
+        "Comentarios": contar_mas_frecuentes(tokens["Corpus_Tokens_Comentarios"], filas_comentarios),
+        "Respuestas": contar_mas_frecuentes(tokens["Corpus_Tokens_Respuestas"], filas_comentarios)
     }
     top_entidades = {
-        "Posts": contar_mas_frecuentes(df_posts_filtrado["Entidades"]),
-        "Comentarios": contar_mas_frecuentes(df_comentarios_filtrado["Entidades_Comentarios"]),
-        "Respuestas": contar_mas_frecuentes(df_comentarios_filtrado["Entidades_Respuestas"])
+        "Posts": contar_mas_frecuentes(tokens["Entidades"], filas_posts),
+        "Comentarios": contar_mas_frecuentes(tokens["Entidades_Comentarios"], filas_comentarios),
+        "Respuestas": contar_mas_frecuentes(tokens["Entidades_Respuestas"], filas_comentarios)
     }
 
     with st.expander("🧾 Tokens y Entidades más frecuentes"):
@@ -102,18 +111,9 @@ def analizar_tokens_entidades(
 
 
 def contar_por_tono(
-    df: pd.DataFrame, columna_tokens: str, columna_tono: str, top_n: int = 20
+    df: pd.DataFrame, matriz: MatrizDocumentoTermino, columna_tono: str, top_n: int = 20
 ) -> Dict[str, List[Tuple[str, int]]]:
-    resultados = {}
-    for tono in df[columna_tono].dropna().unique():
-        subset = df[df[columna_tono] == tono]
-        tokens_planos = [
-            token for lista in subset[columna_tokens].dropna()
-            if isinstance(lista, list) and lista
-            for token in lista
-        ]
-        resultados[tono] = Counter(tokens_planos).most_common(top_n)
-    return resultados
+    return contar_por_categoria(df, matriz, columna_tono, top_n)
 
 
 
@@ -126,26 +126,19 @@ def analizar_tokens_entidades_por_tono(
     Tokens y entidades más frecuentes por tono, considerando los filtros activos.
     """
 
-    ids_filtrados = df_filtrado["ID_Político"].unique()
-    df_posts_filtrado = df_posts[df_posts["ID_Político"].isin(ids_filtrados)].copy()
-    enlaces_validos = df_posts_filtrado["Enlace_Post"].unique()
-    df_comentarios_filtrado = df_comentarios[df_comentarios["Enlace_Post"].isin(enlaces_validos)].copy()
+    df_posts_filtrado, df_comentarios_filtrado = posts_y_comentarios(df_filtrado, df_posts, df_comentarios)
 
-    df_posts_filtrado = deserializar_columnas(df_posts_filtrado, ["Corpus_Tokens", "Entidades"])
-    df_comentarios_filtrado = deserializar_columnas(df_comentarios_filtrado, [
-        "Corpus_Tokens_Comentarios", "Entidades_Comentarios",
-        "Corpus_Tokens_Respuestas", "Entidades_Respuestas"
-    ])
+    tokens = matrices_documento_termino()
 
     tokens_por_tono = {
-        "Posts": contar_por_tono(df_posts_filtrado, "Corpus_Tokens", "Tono"),
-        "Comentarios": contar_por_tono(df_comentarios_filtrado, "Corpus_Tokens_Comentarios", "Tono"),
-        "Respuestas": contar_por_tono(df_comentarios_filtrado, "Corpus_Tokens_Respuestas", "Tono_Respuesta")
+        "Posts": contar_por_tono(df_posts_filtrado, tokens["Corpus_Tokens"], "Tono"),
+        "Comentarios": contar_por_tono(df_comentarios_filtrado, tokens["Corpus_Tokens_Comentarios"], "Tono"),
+        "Respuestas": contar_por_tono(df_comentarios_filtrado, tokens["Corpus_Tokens_Respuestas"], "Tono_Respuesta")
     }
     entidades_por_tono = {
-        "Posts": contar_por_tono(df_posts_filtrado, "Entidades", "Tono"),
-        "Comentarios": contar_por_tono(df_comentarios_filtrado, "Entidades_Comentarios", "Tono"),
-        "Respuestas": contar_por_tono(df_comentarios_filtrado, "Entidades_Respuestas", "Tono_Respuesta")
+        "Posts": contar_por_tono(df_posts_filtrado, tokens["Entidades"], "Tono"),
+        "Comentarios": contar_por_tono(df_comentarios_filtrado, tokens["Entidades_Comentarios"], "Tono"),
+        "Respuestas": contar_por_tono(df_comentarios_filtrado, tokens["Entidades_Respuestas"], "Tono_Respuesta")
     }
 
     with st.expander("🔍 Tokens y Entidades más frecuentes por tono"):
@@ -168,43 +161,45 @@ def analizar_tokens_entidades_por_tono(
 
 
 
-def top_elementos(df: pd.DataFrame, columna: str, n: int = 15) -> set:
+def top_elementos(matriz: MatrizDocumentoTermino, filas: np.ndarray, n: int = 15) -> set:
     """
-    Devuelve el top-n elementos de una columna con listas
+    Devuelve el top-n elementos de una columna de tokens en las filas indicadas
     """
-    counter = Counter(
-        elem for lista in df[columna].dropna() if isinstance(lista, list)
-        for elem in lista
-    )
-    return set(e for e, _ in counter.most_common(n))
+    return set(e for e, _ in contar_mas_frecuentes(matriz, filas, n))
 
 
 
-def comparar_tops(
-    df: pd.DataFrame,
-    columna_elementos: str,
-    columna_categoria: str,
-    categorias: List[str],
-    n: int = 15
-) -> Tuple[Dict[str, set], set, Dict[str, set]]:
+def comparar_tops(tops: Dict[str, set]) -> Tuple[Dict[str, set], set, Dict[str, set]]:
     """
-    Compara top elementos entre categorías, devolviendo:
+    Compara los top elementos de cada categoría, devolviendo:
     - top elementos por categoría
     - comunes a todas
     - exclusivos de cada categoría
     """
-    tops = {
-        cat: top_elementos(df[df[columna_categoria] == cat], columna_elementos, n)
-        for cat in categorias
-    }
     comunes = set.intersection(*tops.values()) if len([s for s in tops.values() if s]) > 1 else set()
     exclusivos = {
-        cat: tops[cat] - set.union(*(tops[c] for c in tops if c != cat))
-        for cat in categorias
+        cat: tops[cat] - set().union(*(tops[c] for c in tops if c != cat))
+        for cat in tops
     }
     return tops, comunes, exclusivos
 
 
+def tops_por_categoria(
+    df: pd.DataFrame,
+    matriz: MatrizDocumentoTermino,
+    columna_categoria: str,
+    categorias: List[str],
+    n: int = 15
+) -> Dict[str, set]:
+    """
+    Top-n elementos de las filas de df de cada valor de una columna categórica.
+    """
+    return {
+        cat: set(e for e, _ in lista)
+        for cat, lista in contar_por_categoria(df, matriz, columna_categoria, n, categorias).items()
+    }
+
+
 def mostrar_comparativa(titulo: str, comunes: set, exclusivos: dict, categorias: List[str]) -> None:
     """
     Presenta la comparativa de elementos comunes y exclusivos entre categorías
@@ -235,31 +230,22 @@ def comparar_tops_streamlit(
     """
     categorias = ["Posts", "Comentarios", "Respuestas"]
 
-    ids_filtrados = df_filtrado["ID_Político"].unique()
-    df_posts_filtrado = df_posts[df_posts["ID_Político"].isin(ids_filtrados)].copy()
-
-    enlaces_validos = df_posts_filtrado["Enlace_Post"].unique()
-    df_comentarios_filtrado = df_comentarios[df_comentarios["Enlace_Post"].isin(enlaces_validos)].copy()
-
-    df_posts_filtrado = deserializar_columnas(df_posts_filtrado, ["Corpus_Tokens", "Entidades"])
-    df_comentarios_filtrado = deserializar_columnas(df_comentarios_filtrado, [
-        "Corpus_Tokens_Comentarios", "Entidades_Comentarios",
-        "Corpus_Tokens_Respuestas", "Entidades_Respuestas"
-    ])
+    df_posts_filtrado, df_comentarios_filtrado = posts_y_comentarios(df_filtrado, df_posts, df_comentarios)
 
-    df_tokens = pd.concat([
-        df_posts_filtrado.assign(Tipo="Posts", Tokens=df_posts_filtrado["Corpus_Tokens"]),
-        df_comentarios_filtrado.assign(Tipo="Comentarios", Tokens=df_comentarios_filtrado["Corpus_Tokens_Comentarios"]),
-        df_comentarios_filtrado.assign(Tipo="Respuestas", Tokens=df_comentarios_filtrado["Corpus_Tokens_Respuestas"])
-    ])
-    tops_tokens, comunes_tokens, exclusivos_tokens = comparar_tops(df_tokens, "Tokens", "Tipo", categorias)
+    tokens = matrices_documento_termino()
+    filas_posts = posiciones(df_posts_filtrado)
+    filas_comentarios = posiciones(df_comentarios_filtrado)
 
-    df_ents = pd.concat([
-        df_posts_filtrado.assign(Tipo="Posts", Ents=df_posts_filtrado["Entidades"]),
-        df_comentarios_filtrado.assign(Tipo="Comentarios", Ents=df_comentarios_filtrado["Entidades_Comentarios"]),
-        df_comentarios_filtrado.assign(Tipo="Respuestas", Ents=df_comentarios_filtrado["Entidades_Respuestas"])
-    ])
-    tops_ents, comunes_ents, exclusivos_ents = comparar_tops(df_ents, "Ents", "Tipo", categorias)
+    tops_tokens, comunes_tokens, exclusivos_tokens = comparar_tops({
+        "Posts": top_elementos(tokens["Corpus_Tokens"], filas_posts),
+        "Comentarios": top_elementos(tokens["Corpus_Tokens_Comentarios"], filas_comentarios),
+        "Respuestas": top_elementos(tokens["Corpus_Tokens_Respuestas"], filas_comentarios)
+    })
+    tops_ents, comunes_ents, exclusivos_ents = comparar_tops({
+        "Posts": top_elementos(tokens["Entidades"], filas_posts),
+        "Comentarios": top_elementos(tokens["Entidades_Comentarios"], filas_comentarios),
+        "Respuestas": top_elementos(tokens["Entidades_Respuestas"], filas_comentarios)
+    })
 
     with st.expander("📚 Comparativa de Tokens y Entidades entre tipos de mensaje"):
         mostrar_comparativa("🔍 Tokens", comunes_tokens, exclusivos_tokens, categorias)
@@ -276,16 +262,16 @@ def comparar_tops_por_tono_streamlit(
     """
     tonos = ["Positivo", "Negativo", "Neutro"]
 
-    ids_filtrados = df_filtrado["ID_Político"].unique()
-    df_posts_filtrado = df_posts[df_posts["ID_Político"].isin(ids_filtrados)].copy()
+    df_posts_filtrado, _ = posts_y_comentarios(df_filtrado, df_posts)
 
-    df_posts_filtrado = deserializar_columnas(df_posts_filtrado, ["Corpus_Tokens", "Entidades"])
+    tokens = matrices_documento_termino()
 
-    df_tokens = df_posts_filtrado.rename(columns={"Corpus_Tokens": "Tokens"})
-    tops_tokens, comunes_tokens, exclusivos_tokens = comparar_tops(df_tokens, "Tokens", "Tono", tonos)
-
-    df_ents = df_posts_filtrado.rename(columns={"Entidades": "Ents"})
-    tops_ents, comunes_ents, exclusivos_ents = comparar_tops(df_ents, "Ents", "Tono", tonos)
+    tops_tokens, comunes_tokens, exclusivos_tokens = comparar_tops(
+        tops_por_categoria(df_posts_filtrado, tokens["Corpus_Tokens"], "Tono", tonos)
+    )
+    tops_ents, comunes_ents, exclusivos_ents = comparar_tops(
+        tops_por_categoria(df_posts_filtrado, tokens["Entidades"], "Tono", tonos)
+    )
 
     with st.expander("🧠 Comparativa de Tokens y Entidades entre tonos"):
         mostrar_comparativa("🔍 Tokens", comunes_tokens, exclusivos_tokens, tonos)
@@ -301,18 +287,18 @@ def comparar_tops_por_tema_streamlit(
     Compara tokens/entidades entre temas,
     aplicando filtros activos de df_filtrado.
     """
-    ids_filtrados = df_filtrado["ID_Político"].unique()
-    df_posts_filtrado = df_posts[df_posts["ID_Político"].isin(ids_filtrados)].copy()
+    df_posts_filtrado, _ = posts_y_comentarios(df_filtrado, df_posts)
 
-    df_posts_filtrado = deserializar_columnas(df_posts_filtrado, ["Corpus_Tokens", "Entidades"])
+    tokens = matrices_documento_termino()
 
     temas = df_posts_filtrado["Tema"].dropna().unique().tolist()
 
-    df_tokens = df_posts_filtrado.rename(columns={"Corpus_Tokens": "Tokens"})
-    tops_tokens, comunes_tokens, exclusivos_tokens = comparar_tops(df_tokens, "Tokens", "Tema", temas)
-
-    df_ents = df_posts_filtrado.rename(columns={"Entidades": "Ents"})
-    tops_ents, comunes_ents, exclusivos_ents = comparar_tops(df_ents, "Ents", "Tema", temas)
+    tops_tokens, comunes_tokens, exclusivos_tokens = comparar_tops(
+        tops_por_categoria(df_posts_filtrado, tokens["Corpus_Tokens"], "Tema", temas)
+    )
+    tops_ents, comunes_ents, exclusivos_ents = comparar_tops(
+        tops_por_categoria(df_posts_filtrado, tokens["Entidades"], "Tema", temas)
+    )
 
     with st.expander("📚 Comparativa de Tokens y Entidades entre temas"):
         mostrar_comparativa("🔍 Tokens", comunes_tokens, exclusivos_tokens, temas)
@@ -321,29 +307,15 @@ def comparar_tops_por_tema_streamlit(
 
 def obtener_top_por_tema(
     df: pd.DataFrame,
-    columna_lista: str,
+    matriz: MatrizDocumentoTermino,
     columna_tema: str,
-    df_filtrado: pd.DataFrame,
     n: int = 20
 ) -> Dict[str, List[Tuple[str, int]]]:
     """
-    Devuelve un diccionario con el top elementos de cada tema,
-    aplicando filtros activos sobre df_filtrado.
+    Devuelve un diccionario con el top elementos de cada tema
+    para las filas (ya filtradas) de df.
     """
-    ids_filtrados = df_filtrado["ID_Político"].unique()
-    df_filtrado_posts = df[df["ID_Político"].isin(ids_filtrados)].copy()
-
-    df_filtrado_posts = deserializar_columnas(df_filtrado_posts, [columna_lista])
-
-    resultados = {}
-    for tema in df_filtrado_posts[columna_tema].dropna().unique():
-        subset = df_filtrado_posts[df_filtrado_posts[columna_tema] == tema]
-        elementos = [
-            item for sublista in subset[columna_lista].dropna()
-            if isinstance(sublista, list) for item in sublista
-        ]
-        resultados[tema] = Counter(elementos).most_common(n)
-    return resultados
+    return contar_por_categoria(df, matriz, columna_tema, n)
 
 
 
@@ -381,13 +353,12 @@ def analizar_tokens_entidades_por_tema(
     Muestra tokens y entidades más frecuentes por tema,
     respetando el filtrado activo.
     """
-    ids_filtrados = df_filtrado["ID_Político"].unique()
-    df_posts_filtrado = df_posts[df_posts["ID_Político"].isin(ids_filtrados)].copy()
+    df_posts_filtrado, _ = posts_y_comentarios(df_filtrado, df_posts)
 
-    df_posts_filtrado = deserializar_columnas(df_posts_filtrado, ["Corpus_Tokens", "Entidades"])
+    tokens = matrices_documento_termino()
 
-    top_tokens = obtener_top_por_tema(df_posts_filtrado, "Corpus_Tokens", "Tema", df_filtrado)
-    top_entidades = obtener_top_por_tema(df_posts_filtrado, "Entidades", "Tema", df_filtrado)
+    top_tokens = obtener_top_por_tema(df_posts_filtrado, tokens["Corpus_Tokens"], "Tema")
+    top_entidades = obtener_top_por_tema(df_posts_filtrado, tokens["Entidades"], "Tema")
 
     with st.expander("📚 Tokens y Entidades más frecuentes por tema"):
         st.subheader("Tokens por tema")
@@ -0,0 +1,86 @@
+"""
+Matrices documento x término de las columnas de tokens y entidades en
+formato CSR sobre el vocabulario global: indptr son los offsets de
+ColumnaTokens, indices sus ids y cada aparición vale 1, así que se usan los
+mismos arrays sin copiarlos. Los términos más frecuentes de cualquier
+selección de filas (filtros, fuente) son una suma por columnas de esas filas
+y un top-N con argpartition; los de varios grupos a la vez (tono, tema) salen
+de una suma dispersa grupo x término, sin reservar grupos x vocabulario.
+"""
+import numpy as np
+import streamlit as st
+from typing import Dict, List, Optional, Tuple
+from data_loader import cargar_tokens, obtener_version_datos
+from ingesta import ColumnaTokens
+from analisis_en_profundidad.ranking import top_n
+
+
+class MatrizDocumentoTermino:
+    """
+    Matriz CSR documento x término (una fila por fila de la hoja, en el
+    orden de cargar_columnas) con los valores implícitos a 1.
+    """
+
+    def __init__(self, columna: ColumnaTokens):
+        self.columna = columna
+        self.indptr = columna.offsets
+        self.indices = columna.ids
+        self.vocabulario = columna.vocabulario
+
+    def __len__(self) -> int:
+        return len(self.indptr) - 1
+
+    def sumar_columnas(self, filas: np.ndarray) -> np.ndarray:
+        """
+        Frecuencia de cada término del vocabulario en las filas indicadas.
+        """
+        return np.bincount(self.columna.ids_de_filas(filas), minlength=len(self.vocabulario))
+
+    def sumar_por_grupo(
+        self,
+        filas: np.ndarray,
+        codigos: np.ndarray,
+        n_grupos: int
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Frecuencias de las filas indicadas sumadas según su código de grupo
+        (los negativos se descartan), como matriz dispersa grupo x término en
+        CSR: (indptr por grupo, términos, frecuencias). Solo se guardan los
+        pares (grupo, término) presentes, con los términos de cada grupo en
+        orden de vocabulario.
+        """
+        con_grupo = np.asarray(codigos) >= 0
+        filas = np.asarray(filas, dtype=np.int64)[con_grupo]
+        longitudes = self.indptr[filas + 1] - self.indptr[filas]
+        grupos = np.repeat(np.asarray(codigos)[con_grupo].astype(np.int64), longitudes)
+        n_terminos = len(self.vocabulario)
+        claves, frecuencias = np.unique(
+            grupos * n_terminos + self.columna.ids_de_filas(filas), return_counts=True
+        )
+        indptr = np.searchsorted(claves // n_terminos, np.arange(n_grupos + 1))
+        return indptr, claves % n_terminos, frecuencias
+
+    def top(self, frecuencias: np.ndarray, n: int, terminos: Optional[np.ndarray] = None) -> List[Tuple[str, int]]:
+        """
+        Los n términos más frecuentes (con frecuencia positiva) de mayor a
+        menor; los empates, por orden del vocabulario. `frecuencias` es un
+        vector denso sobre el vocabulario o, con `terminos`, las frecuencias
+        de esos términos (en orden de vocabulario).
+        """
+        terminos = np.arange(len(frecuencias)) if terminos is None else terminos
+        orden = top_n(frecuencias, n)
+        orden = orden[frecuencias[orden] > 0]
+        return [(self.vocabulario[terminos[i]], int(frecuencias[i])) for i in orden]
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _matrices_version(version: str) -> Dict[str, MatrizDocumentoTermino]:
+    return {col: MatrizDocumentoTermino(columna) for col, columna in cargar_tokens().items()}
+
+
+def matrices_documento_termino() -> Dict[str, MatrizDocumentoTermino]:
+    """
+    Matriz documento x término de cada columna de tokens y entidades de
+    Posts y Comentarios, construidas una vez por versión de los datos.
+    """
+    return _matrices_version(obtener_version_datos())
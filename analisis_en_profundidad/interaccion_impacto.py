@@ -1,51 +1,16 @@
 import streamlit as st
 import plotly.graph_objects as go
-import pandas as pd
 from config import COLOR_PARTIDOS
+from analisis_en_profundidad.agregados import PlanAgregacion
 from analisis_en_profundidad.utils import plot_top10_bar
 
 
-@st.cache_data
-def calcular_interaccion_promedio(df_posts: pd.DataFrame) -> pd.DataFrame:
+def grafico_top10_interaccion(plan: PlanAgregacion) -> None:
     """
-    Devuelve un DataFrame con la interacción promedio por publicación para cada político.
+    Muestra el gráfico de los 10 políticos con mayor interacción promedio por publicación
+    (en el periodo elegido, si se limita la interacción a una ventana de fechas).
     """
-    interacciones = (
-        df_posts.groupby("ID_Político")
-        .agg({
-            "Likes": "sum",
-            "Retweets": "sum",
-            "Comentarios_Totales": "sum",
-            "Enlace_Post": "count"
-        })
-        .rename(columns={"Enlace_Post": "Posts_extraidos"})
-        .reset_index()
-    )
-
-    interacciones["Interacción"] = round(
-        (interacciones["Likes"] + interacciones["Retweets"] + interacciones["Comentarios_Totales"])
-        / interacciones["Posts_extraidos"],
-        0
-    )
-
-    return interacciones
-
-
-
-
-def grafico_top10_interaccion(df_metadata: pd.DataFrame, df_posts: pd.DataFrame = None) -> None:
-    """
-    Muestra el gráfico de los 10 políticos con mayor interacción promedio por publicación.
-    Si se pasa df_posts, recalcula la interacción en tiempo real.
-    """
-    if df_posts is not None:
-        interacciones = calcular_interaccion_promedio(df_posts)
-        df = df_metadata.merge(interacciones, on="ID_Político", how="left")
-    else:
-        df = df_metadata.copy()
-
-    df = df[df["Interacción"].notna()]
-    top10 = df[["Nombre", "Partido", "Interacción"]].nlargest(10, "Interacción")
+    top10 = plan.top("Político", "Interacción")
 
     fig = go.Figure()
     for partido in top10["Partido"].unique():
@@ -77,18 +42,11 @@ def grafico_top10_interaccion(df_metadata: pd.DataFrame, df_posts: pd.DataFrame
     st.plotly_chart(fig)
 
 
-def grafico_top10_interaccion_partido(df_metadata: pd.DataFrame) -> None:
+def grafico_top10_interaccion_partido(plan: PlanAgregacion) -> None:
     """
     Muestra el gráfico del top 10 partidos con mayor interacción promedio por publicación.
     """
-    df_filtrado = df_metadata[df_metadata["Interacción"].notna()]
-
-    top10 = (
-        df_filtrado.groupby("Partido", as_index=False)["Interacción"]
-        .mean()
-        .round(0)
-        .nlargest(10, "Interacción")
-    )
+    top10 = plan.top("Partido", "Interacción", decimales=0)
 
     partidos = top10["Partido"].tolist()
     interacciones = top10["Interacción"].tolist()
@@ -119,33 +77,23 @@ def grafico_top10_interaccion_partido(df_metadata: pd.DataFrame) -> None:
     st.plotly_chart(fig)
 
 
-def grafico_top10_interaccion_relativa_politicos(df_metadata: pd.DataFrame) -> None:
+def grafico_top10_interaccion_relativa_politicos(plan: PlanAgregacion) -> None:
     """
     Gráfico del top 10 políticos con mayor interacción relativa (por seguidor).
     """
-    df_filtrado = df_metadata[df_metadata["Interacción_Relativa"].notna()].copy()
-    df_filtrado["Interacción_Relativa"] = df_filtrado["Interacción_Relativa"].round(3)
-
     plot_top10_bar(
-        df_filtrado,
+        plan.top("Político", "Interacción_Relativa", decimales=3),
         value_col="Interacción_Relativa",
         title="Top 10 políticos con mayor interacción relativa (por seguidor)",
         yaxis_title="Interacción relativa"
     )
 
 
-def grafico_top10_interaccion_relativa_partidos(df_metadata: pd.DataFrame) -> None:
+def grafico_top10_interaccion_relativa_partidos(plan: PlanAgregacion) -> None:
     """
     Gráfico del top 10 partidos con mayor interacción relativa promedio.
     """
-    df_filtrado = df_metadata[df_metadata["Interacción_Relativa"].notna()]
-
-    top10 = (
-        df_filtrado.groupby("Partido", as_index=False)["Interacción_Relativa"]
-        .mean()
-        .round(3)
-        .nlargest(10, "Interacción_Relativa")
-    )
+    top10 = plan.top("Partido", "Interacción_Relativa", decimales=3)
 
     partidos = top10["Partido"].tolist()
     valores = top10["Interacción_Relativa"].tolist()
@@ -1,28 +1,25 @@
 import streamlit as st
 import plotly.graph_objects as go
 import plotly.express as px
-import pandas as pd
+from typing import Union
 from config import COLOR_PARTIDOS
+from analisis_en_profundidad.agregados import PlanAgregacion
 from analisis_en_profundidad.utils import ajustar_nombres_ccaa, plot_top10_bar
 
 
 def plot_top10_partidos_bar(
-    df: pd.DataFrame,
+    plan: PlanAgregacion,
     value_col: str,
     title: str,
     yaxis_title: str
 ) -> None:
     """
-    Gráfico de barras del top 10 partidos por la métrica especificada.
+    Gráfico de barras del top 10 partidos por la suma de la métrica especificada.
     """
-    top10 = (
-        df.groupby("Partido", as_index=False)[value_col]
-        .sum()
-        .nlargest(10, value_col)
-    )
+    top10 = plan.top("Partido", value_col, aggfunc="sum")
 
-    partidos = top10.sort_values(value_col, ascending=False)["Partido"].tolist()
-    valores = top10.sort_values(value_col, ascending=False)[value_col].tolist()
+    partidos = top10["Partido"].tolist()
+    valores = top10[value_col].tolist()
     colores = [COLOR_PARTIDOS.get(p, "#cccccc") for p in partidos]
 
     fig = go.Figure([
@@ -50,75 +47,52 @@ def plot_top10_partidos_bar(
     )
     st.plotly_chart(fig)
 
-@st.cache_data
-def calcular_tasa_publicacion(df: pd.DataFrame, año_actual: int = 2025) -> pd.DataFrame:
-    """
-    Calcula la tasa de publicaciones anuales para cada político.
-    """
-    df = df.copy()
-    df["Tasa_Posts_Año"] = df.apply(
-        lambda row: round(
-            row["Posts"] / (año_actual - row["Comienzo en X/Twitter"]), 0
-        ) if row["Comienzo en X/Twitter"] and (año_actual - row["Comienzo en X/Twitter"]) > 0 else 0,
-        axis=1
-    )
-    return df
-
-
 
-def grafico_top10_politicos_seguidores(df: pd.DataFrame) -> None:
+def grafico_top10_politicos_seguidores(plan: PlanAgregacion) -> None:
     plot_top10_bar(
-        df,
+        plan.top("Político", "Seguidores"),
         value_col="Seguidores",
         title="Top 10 políticos con más seguidores",
         yaxis_title="Seguidores"
     )
 
-def grafico_top10_politicos_posts(df: pd.DataFrame) -> None:
+def grafico_top10_politicos_posts(plan: PlanAgregacion) -> None:
     plot_top10_bar(
-        df,
+        plan.top("Político", "Posts"),
         value_col="Posts",
         title="Top 10 políticos con más publicaciones",
         yaxis_title="Posts"
     )
 
-def grafico_top10_partidos_seguidores(df: pd.DataFrame) -> None:
+def grafico_top10_partidos_seguidores(plan: PlanAgregacion) -> None:
     plot_top10_partidos_bar(
-        df,
+        plan,
         value_col="Seguidores",
         title="Top 10 partidos con más seguidores",
         yaxis_title="Seguidores"
     )
 
-def grafico_top10_partidos_posts(df: pd.DataFrame) -> None:
+def grafico_top10_partidos_posts(plan: PlanAgregacion) -> None:
     plot_top10_partidos_bar(
-        df,
+        plan,
         value_col="Posts",
         title="Top 10 partidos con más publicaciones",
         yaxis_title="Posts"
     )
 
-def grafico_top10_tasa_posts(df: pd.DataFrame, año_actual: int = 2025) -> None:
-    df_tasa = calcular_tasa_publicacion(df, año_actual)
+def grafico_top10_tasa_posts(plan: PlanAgregacion) -> None:
     plot_top10_bar(
-        df_tasa,
+        plan.top("Político", "Tasa_Posts_Año"),
         value_col="Tasa_Posts_Año",
         title="Top 10 políticos con mayor tasa de publicaciones anuales",
         yaxis_title="Posts por año"
     )
 
-def grafico_top10_tasa_posts_partido(df: pd.DataFrame) -> None:
-    top10 = (
-        df[df["Tasa_Posts_Año"].notna()]
-        .groupby("Partido", as_index=False)["Tasa_Posts_Año"]
-        .mean()
-        .round(0)
-        .sort_values("Tasa_Posts_Año", ascending=False)
-        .head(10)
-    )
+def grafico_top10_tasa_posts_partido(plan: PlanAgregacion) -> None:
+    top10 = plan.top("Partido", "Tasa_Posts_Año", decimales=0)
 
-    partidos = top10.sort_values("Tasa_Posts_Año", ascending=False)["Partido"].tolist()
-    tasas = top10.sort_values("Tasa_Posts_Año", ascending=False)["Tasa_Posts_Año"].tolist()
+    partidos = top10["Partido"].tolist()
+    tasas = top10["Tasa_Posts_Año"].tolist()
     colores = [COLOR_PARTIDOS.get(p, "#cccccc") for p in partidos]
 
     fig = go.Figure([
@@ -145,27 +119,19 @@ def grafico_top10_tasa_posts_partido(df: pd.DataFrame) -> None:
     )
     st.plotly_chart(fig)
 
-def grafico_top10_tasa_seguidores(df: pd.DataFrame) -> None:
-    df_filtrado = df[df["Tasa_Seguidores_Año"].notna()]
+def grafico_top10_tasa_seguidores(plan: PlanAgregacion) -> None:
     plot_top10_bar(
-        df_filtrado,
+        plan.top("Político", "Tasa_Seguidores_Año"),
         value_col="Tasa_Seguidores_Año",
         title="Top 10 políticos con mayor tasa anual de ganancia de seguidores",
         yaxis_title="Seguidores por año"
     )
 
-def grafico_top10_tasa_seguidores_partido(df: pd.DataFrame) -> None:
-    top10 = (
-        df[df["Tasa_Seguidores_Año"].notna()]
-        .groupby("Partido", as_index=False)["Tasa_Seguidores_Año"]
-        .mean()
-        .round(0)
-        .sort_values("Tasa_Seguidores_Año", ascending=False)
-        .head(10)
-    )
+def grafico_top10_tasa_seguidores_partido(plan: PlanAgregacion) -> None:
+    top10 = plan.top("Partido", "Tasa_Seguidores_Año", decimales=0)
 
-    partidos = top10.sort_values("Tasa_Seguidores_Año", ascending=False)["Partido"].tolist()
-    tasas = top10.sort_values("Tasa_Seguidores_Año", ascending=False)["Tasa_Seguidores_Año"].tolist()
+    partidos = top10["Partido"].tolist()
+    tasas = top10["Tasa_Seguidores_Año"].tolist()
     colores = [COLOR_PARTIDOS.get(p, "#cccccc") for p in partidos]
 
     fig = go.Figure([
@@ -193,8 +159,8 @@ def grafico_top10_tasa_seguidores_partido(df: pd.DataFrame) -> None:
     st.plotly_chart(fig)
 
 def mapa_variable_ccaa(
-    df: pd.DataFrame,
-    geojson_ccaa: dict,
+    plan: PlanAgregacion,
+    geojson_ccaa: Union[str, dict],
     variable: str,
     aggfunc: str = "mean",
     round_decimals: int = 0,
@@ -205,12 +171,9 @@ def mapa_variable_ccaa(
     """
     Mapa coroplético de una variable agregada por comunidad autónoma.
     """
-    df_map = (
-        df.groupby("Comunidad Autónoma", as_index=False)[variable]
-        .agg(aggfunc)
-        .round(round_decimals)
+    df_map = ajustar_nombres_ccaa(
+        plan.por_grupo("Comunidad Autónoma", variable, aggfunc).round(round_decimals)
     )
-    df_map = ajustar_nombres_ccaa(df_map)
 
     fig = px.choropleth(
         df_map,
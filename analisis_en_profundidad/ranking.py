@@ -0,0 +1,106 @@
+"""
+Rankings top-N de cualquier entidad (político, partido, comunidad autónoma)
+por cualquier métrica. Para los políticos se precalcula, una vez por versión
+de los datos, el orden descendente de cada métrica sobre toda la Metadata: el
+top-N de una selección es recorrer ese orden quedándose con las filas
+seleccionadas hasta reunir N. Las métricas sin orden precalculado (p. ej. las
+agregadas por grupo, que dependen de los filtros) usan argpartition.
+
+En todos los casos se descartan los NaN y los empates se resuelven a favor
+de la fila anterior, como DataFrame.nlargest(keep="first").
+"""
+import numpy as np
+import pandas as pd
+import streamlit as st
+from typing import Dict, Optional, Tuple
+from data_loader import cargar_columnas, obtener_version_datos
+from metricas import aplicar_metricas
+
+# Métricas por político con orden precalculado: decimales a los que se
+# redondean antes de ordenar (None = sin redondear)
+ORDENES_POLITICOS: Dict[str, Optional[int]] = {
+    "Seguidores": None,
+    "Posts": None,
+    "Tasa_Posts_Año": None,
+    "Tasa_Seguidores_Año": None,
+    "Interacción": None,
+    "Interacción_Relativa": 3,
+}
+
+
+def _valores(valores, decimales: Optional[int] = None) -> np.ndarray:
+    valores = pd.to_numeric(pd.Series(valores), errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    return valores if decimales is None else np.round(valores, decimales)
+
+
+def orden_descendente(valores: np.ndarray) -> np.ndarray:
+    """
+    Posiciones de los valores no nulos de mayor a menor (orden estable).
+    """
+    validos = np.flatnonzero(~np.isnan(valores))
+    return validos[np.argsort(-valores[validos], kind="stable")]
+
+
+def top_n(valores, n: int, decimales: Optional[int] = None) -> np.ndarray:
+    """
+    Posiciones de los n mayores valores, de mayor a menor, sin ordenar el
+    array completo: argpartition localiza el umbral y solo se ordenan los
+    candidatos.
+    """
+    valores = _valores(valores, decimales)
+    validos = np.flatnonzero(~np.isnan(valores))
+    if len(validos) > n:
+        umbral = np.partition(valores[validos], len(validos) - n)[len(validos) - n]
+        mayores = validos[valores[validos] > umbral]
+        iguales = validos[valores[validos] == umbral][:n - len(mayores)]
+        validos = np.concatenate((mayores, iguales))
+    return validos[np.lexsort((validos, -valores[validos]))]
+
+
+class OrdenesDescendentes:
+    """
+    Orden descendente precalculado de cada métrica sobre todas las filas de
+    una tabla. top() recibe la selección como posiciones de fila de esa tabla.
+    """
+
+    def __init__(self, df: pd.DataFrame, metricas: Dict[str, Optional[int]]):
+        self.n_filas = len(df)
+        self.ordenes: Dict[Tuple[str, Optional[int]], np.ndarray] = {
+            (metrica, decimales): orden_descendente(_valores(df[metrica], decimales))
+            for metrica, decimales in metricas.items() if metrica in df.columns
+        }
+
+    def disponible(self, metrica: str, decimales: Optional[int] = None) -> bool:
+        return (metrica, decimales) in self.ordenes
+
+    def top(self, metrica: str, n: int, filas: np.ndarray, decimales: Optional[int] = None) -> np.ndarray:
+        """
+        Las n primeras filas seleccionadas en el orden de la métrica. El orden
+        se recorre por bloques de tamaño creciente y se para en cuanto hay n.
+        """
+        orden = self.ordenes[(metrica, decimales)]
+        seleccion = np.zeros(self.n_filas, dtype=bool)
+        seleccion[filas] = True
+
+        elegidas = []
+        reunidas, inicio, bloque = 0, 0, max(4 * n, 64)
+        while reunidas < n and inicio < len(orden):
+            trozo = orden[inicio:inicio + bloque]
+            trozo = trozo[seleccion[trozo]]
+            elegidas.append(trozo)
+            reunidas += len(trozo)
+            inicio, bloque = inicio + bloque, bloque * 2
+        return np.concatenate(elegidas)[:n] if elegidas else np.empty(0, dtype=np.int64)
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _ordenes_politicos_version(version: str) -> OrdenesDescendentes:
+    return OrdenesDescendentes(aplicar_metricas(cargar_columnas("Metadata")), ORDENES_POLITICOS)
+
+
+def ordenes_politicos() -> OrdenesDescendentes:
+    """
+    Órdenes de ORDENES_POLITICOS sobre toda la Metadata (con las métricas
+    derivadas calculadas), construidos una vez por versión de los datos.
+    """
+    return _ordenes_politicos_version(obtener_version_datos())
@@ -0,0 +1,294 @@
+"""
+Series temporales de conteos por político: arrays densos [fila de Metadata,
+día, categoría] (posts por tono; posts y comentarios recibidos, para la
+actividad) a partir de los que cualquier serie
+filtrada y reagrupada (por día, semana o mes; por partido o por político) es
+una suma de filas. Cuando el almacén solo ha recibido partes nuevas
+(ingesta.anexar), la serie de la versión anterior se completa con ellas en
+el mismo array (el eje de días se reserva con margen) y solo se tocan los
+días de los posts añadidos.
+
+Para dibujarlas, las series más largas que el ancho disponible se reducen con
+largest-triangle-three-buckets (LTTB), que conserva picos y valles.
+"""
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import streamlit as st
+from typing import Dict, List, Optional, Sequence, Tuple
+from almacen import convertir_fechas, estado_partes, leer_partes
+from data_loader import cargar_columnas, obtener_version_datos
+from esquema import TONOS
+
+FRECUENCIAS: Dict[str, str] = {"Día": "D", "Semana": "W", "Mes": "M"}
+COLUMNAS_POSTS_TONO = ["ID_Político", "Fecha_Publicación", "Tono", "Tema"]
+CATEGORIAS_ACTIVIDAD: List[str] = ["Posts", "Comentarios"]
+# Días libres que se reservan al final del eje al ampliarlo, para que los
+# anexos con fechas nuevas no tengan que copiar todo el array
+MARGEN_DIAS = 366
+# Series de tono (una por tema) que se conservan entre versiones de los datos
+MAX_SERIES_TONO = 2
+# Grupo con el que se muestran los comentarios a posts que no están en la hoja
+AUTOR_DESCONOCIDO = "Autor desconocido"
+
+
+class SerieDiaria:
+    """
+    Conteos enteros [fila, día, categoría] desde `dia_inicial` (días desde
+    1970-01-01). Los ejes de días y de categorías crecen al anexar datos
+    fuera de su rango: los días nuevos al final ocupan el margen reservado
+    (MARGEN_DIAS) y solo se copia el array cuando este se agota, cuando hay
+    días anteriores al primero o categorías nuevas.
+
+    Las filas siguen el orden de `ids` (ID_Político) y se localizan con
+    filas(). Con `desconocidos`, una fila más al final (fila_desconocida)
+    recoge las observaciones sin político (id nulo).
+    """
+
+    def __init__(self, ids: pd.Series, categorias: Sequence[str], desconocidos: bool = False):
+        self.ids = ids.astype(object).to_numpy()
+        self.categorias = list(categorias)
+        self.fila_desconocida = len(self.ids) if desconocidos else None
+        self.dia_inicial = 0
+        self.n_dias = 0
+        self._datos = np.zeros((len(self.ids) + desconocidos, 0, len(self.categorias)), dtype=np.int32)
+        self.partes: Dict[str, Tuple[int, int]] = {}
+
+    @property
+    def conteos(self) -> np.ndarray:
+        return self._datos[:, :self.n_dias]
+
+    def dias(self, tramo: slice = slice(None)) -> pd.DatetimeIndex:
+        return pd.DatetimeIndex(
+            np.arange(self.dia_inicial, self.dia_inicial + self.conteos.shape[1])[tramo].astype("datetime64[D]")
+        )
+
+    def tramo(self, desde, hasta) -> slice:
+        """
+        Posiciones del eje de días entre `desde` y `hasta` (incluidos).
+        """
+        inicio = (pd.Timestamp(desde) - pd.Timestamp(0)).days - self.dia_inicial
+        fin = (pd.Timestamp(hasta) - pd.Timestamp(0)).days - self.dia_inicial + 1
+        return slice(max(inicio, 0), max(fin, 0))
+
+    def filas(self, ids) -> np.ndarray:
+        """
+        Fila de cada ID_Político de `ids` (-1 si no está en la serie).
+        """
+        return pd.Index(self.ids).get_indexer(pd.Series(ids).astype(object))
+
+    def _codigos(self, valores: pd.Series) -> np.ndarray:
+        valores = valores.astype(object)
+        nuevas = [v for v in pd.unique(valores.dropna()) if v not in self.categorias]
+        if nuevas:
+            self.categorias += sorted(nuevas, key=str)
+            self._datos = np.pad(self._datos, ((0, 0), (0, 0), (0, len(nuevas))))
+        return pd.Index(self.categorias).get_indexer(valores)
+
+    def _ampliar(self, primero: int, ultimo: int) -> None:
+        if self.n_dias == 0:
+            self.dia_inicial = primero
+        antes = max(self.dia_inicial - primero, 0)
+        n_dias = max(ultimo - self.dia_inicial + antes + 1, self.n_dias + antes)
+        if antes or n_dias > self._datos.shape[1]:
+            datos = np.zeros((len(self._datos), n_dias + MARGEN_DIAS, len(self.categorias)), dtype=np.int32)
+            datos[:, antes:antes + self.n_dias] = self.conteos
+            self._datos = datos
+            self.dia_inicial -= antes
+        self.n_dias = n_dias
+
+    def anexar(self, ids: pd.Series, fechas: pd.Series, valores: pd.Series) -> None:
+        """
+        Suma una observación por fila (político, fecha, categoría). Solo se
+        actualiza el bloque de días que cubren las fechas anexadas; se ignoran
+        las filas sin fecha válida o sin categoría y las de un político que no
+        está en la serie. Las de id nulo van a la fila_desconocida, si la hay.
+        """
+        filas = self.filas(ids)
+        if self.fila_desconocida is not None:
+            filas[ids.isna().to_numpy()] = self.fila_desconocida
+        codigos = self._codigos(valores)
+        fechas = convertir_fechas(fechas)
+        validos = (filas >= 0) & (codigos >= 0) & fechas.notna().to_numpy()
+        if not validos.any():
+            return
+        dias = fechas[validos].to_numpy().astype("datetime64[D]").astype(np.int64)
+        filas, codigos = filas[validos], codigos[validos]
+        primero, ultimo = int(dias.min()), int(dias.max())
+        self._ampliar(primero, ultimo)
+
+        n_filas, ancho, n_categorias = len(self._datos), ultimo - primero + 1, len(self.categorias)
+        bloque = np.bincount(
+            (filas * ancho + (dias - primero)) * n_categorias + codigos,
+            minlength=n_filas * ancho * n_categorias
+        ).reshape(n_filas, ancho, n_categorias)
+        inicio = primero - self.dia_inicial
+        self._datos[:, inicio:inicio + ancho] += bloque.astype(np.int32)
+
+    def sumar(self, filas: np.ndarray, codigos: np.ndarray, n_grupos: int, tramo: slice = slice(None)) -> np.ndarray:
+        """
+        Conteos enteros [grupo, día, categoría] de las filas indicadas (de
+        filas()), sumadas según su código de grupo; se descartan las filas y
+        los códigos negativos. Las filas se ordenan por grupo y cada tramo
+        consecutivo se suma con np.add.reduceat. Con `tramo` solo se suman
+        esos días.
+        """
+        validas = (codigos >= 0) & (filas >= 0)
+        filas, codigos = filas[validas], codigos[validas]
+        orden = np.argsort(codigos, kind="stable")
+        conteos = self.conteos[filas[orden], tramo]
+        sumas = np.zeros((n_grupos, *conteos.shape[1:]), dtype=np.int64)
+        presentes = np.flatnonzero(np.bincount(codigos, minlength=n_grupos))
+        if len(presentes):
+            inicios = np.searchsorted(codigos[orden], presentes)
+            sumas[presentes] = np.add.reduceat(conteos, inicios, axis=0, dtype=np.int64)
+        return sumas
+
+    def remuestrear(
+        self,
+        conteos: np.ndarray,
+        frecuencia: str,
+        tramo: slice = slice(None)
+    ) -> Tuple[pd.DatetimeIndex, np.ndarray]:
+        """
+        Agrupa el eje de días (penúltimo; el `tramo` con el que se sumaron los
+        conteos) en periodos de `frecuencia` ("D", "W" o "M"); devuelve el
+        inicio de cada periodo y los conteos sumados.
+        """
+        dias = self.dias(tramo)
+        if frecuencia == "D" or not len(dias):
+            return dias, conteos
+        periodos = dias.to_period(frecuencia)
+        inicios = np.flatnonzero(np.r_[True, periodos[1:] != periodos[:-1]])
+        return periodos[inicios].start_time, np.add.reduceat(conteos, inicios, axis=-2)
+
+
+def lttb(x: np.ndarray, y: np.ndarray, puntos: int) -> np.ndarray:
+    """
+    Posiciones de los `puntos` puntos que conserva largest-triangle-three-
+    buckets: el primero, el último y, en cada uno de los puntos - 2 tramos
+    intermedios, el que forma el triángulo de mayor área con el punto elegido
+    en el tramo anterior y la media del siguiente. Con menos puntos que
+    `puntos` se devuelven todos.
+    """
+    n = len(y)
+    if puntos >= n or puntos < 3:
+        return np.arange(n)
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    # Bordes de los tramos en aritmética entera: con linspace algunos caían una
+    # posición antes por redondeo
+    bordes = 1 + np.arange(puntos - 1) * (n - 2) // (puntos - 2)
+    limites = np.append(bordes, n)
+
+    elegidos = np.empty(puntos, dtype=np.int64)
+    elegidos[0], elegidos[-1] = 0, n - 1
+    a = 0
+    for i in range(puntos - 2):
+        inicio, fin, siguiente = limites[i], limites[i + 1], limites[i + 2]
+        media_x, media_y = x[fin:siguiente].mean(), y[fin:siguiente].mean()
+        areas = np.abs(
+            (x[a] - media_x) * (y[inicio:fin] - y[a]) - (x[a] - x[inicio:fin]) * (media_y - y[a])
+        )
+        a = inicio + int(np.argmax(areas))
+        elegidos[i + 1] = a
+    return elegidos
+
+
+def submuestrear(df: pd.DataFrame, x: str, y: str, grupos: List[str], puntos: int) -> pd.DataFrame:
+    """
+    Reduce cada serie de un DataFrame en formato largo (una por combinación
+    de `grupos`, ordenada por `x`) a `puntos` puntos con lttb.
+    """
+    valores_x = df[x].to_numpy()
+    if np.issubdtype(valores_x.dtype, np.datetime64):
+        valores_x = valores_x.astype("datetime64[s]").astype(np.int64)
+    valores_y = df[y].to_numpy(dtype=float)
+
+    posiciones = [
+        filas[lttb(valores_x[filas], valores_y[filas], puntos)]
+        for filas in df.groupby(grupos, sort=False, observed=True).indices.values()
+    ]
+    return df.iloc[np.sort(np.concatenate(posiciones))] if posiciones else df
+
+
+def _contar_tono(serie: SerieDiaria, posts: pd.DataFrame, tema: Optional[str]) -> None:
+    if tema is not None:
+        posts = posts[(posts["Tema"].astype(object) == tema).to_numpy()]
+    serie.anexar(posts["ID_Político"], posts["Fecha_Publicación"], posts["Tono"])
+
+
+_CERROJO = threading.Lock()
+_ULTIMAS: "OrderedDict[Optional[str], SerieDiaria]" = OrderedDict()
+
+
+@st.cache_resource(show_spinner=False, max_entries=MAX_SERIES_TONO)
+def _serie_tono_version(version: str, tema: Optional[str]) -> SerieDiaria:
+    ids = cargar_columnas("Metadata", ["ID_Político"])["ID_Político"]
+    with _CERROJO:
+        partes = estado_partes("Posts")
+        previa = _ULTIMAS.pop(tema, None)
+        if (
+            previa is not None and partes and previa.partes.items() <= partes.items()
+            and np.array_equal(previa.ids, ids.astype(object).to_numpy())
+        ):
+            # Solo han aparecido partes nuevas: se cuentan sobre la misma serie,
+            # que deja de valer para la versión anterior
+            serie = previa
+            nuevas = [parte for parte in partes if parte not in previa.partes]
+            if nuevas:
+                _contar_tono(serie, leer_partes(nuevas, COLUMNAS_POSTS_TONO).to_pandas(), tema)
+        else:
+            serie = SerieDiaria(ids, TONOS)
+            _contar_tono(serie, cargar_columnas("Posts", COLUMNAS_POSTS_TONO), tema)
+        serie.partes = partes
+
+        _ULTIMAS[tema] = serie
+        while len(_ULTIMAS) > MAX_SERIES_TONO:
+            _ULTIMAS.popitem(last=False)
+    return serie
+
+
+def serie_tono(tema: Optional[str] = None) -> SerieDiaria:
+    """
+    Posts por [político, día, tono] (solo los del tema indicado, si se pasa
+    uno), construida una vez por versión de los datos.
+    """
+    return _serie_tono_version(obtener_version_datos(), tema)
+
+
+def _autores_comentarios(posts: pd.DataFrame, comentarios: pd.DataFrame) -> pd.Series:
+    """
+    ID_Político del post al que responde cada comentario (None si el post no
+    está en la hoja Posts o no tiene autor).
+    """
+    unicos = ~posts["Enlace_Post"].duplicated().to_numpy()
+    posicion = pd.Index(posts["Enlace_Post"].astype(object)[unicos]).get_indexer(comentarios["Enlace_Post"].astype(object))
+    ids = posts["ID_Político"].astype(object).to_numpy()[unicos]
+    return pd.Series(np.where(posicion >= 0, ids[posicion], None), index=comentarios.index, dtype=object)
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _serie_actividad_version(version: str) -> SerieDiaria:
+    posts = cargar_columnas("Posts", ["ID_Político", "Enlace_Post", "Fecha_Publicación"])
+    comentarios = cargar_columnas("Comentarios", ["Enlace_Post", "Fecha_Publicación"])
+    serie = SerieDiaria(
+        cargar_columnas("Metadata", ["ID_Político"])["ID_Político"], CATEGORIAS_ACTIVIDAD, desconocidos=True
+    )
+    serie.anexar(posts["ID_Político"], posts["Fecha_Publicación"], pd.Series("Posts", index=posts.index))
+    serie.anexar(
+        _autores_comentarios(posts, comentarios),
+        comentarios["Fecha_Publicación"],
+        pd.Series("Comentarios", index=comentarios.index)
+    )
+    return serie
+
+
+def serie_actividad() -> SerieDiaria:
+    """
+    Posts publicados y comentarios recibidos por [político, día], construida
+    una vez por versión de los datos. Un comentario cuenta para el autor del
+    post al que responde y en la fecha del comentario; los que responden a un
+    post que no está en la hoja Posts van a la fila_desconocida.
+    """
+    return _serie_actividad_version(obtener_version_datos())
@@ -1,55 +1,25 @@
 import streamlit as st
 import plotly.graph_objects as go
 import plotly.express as px
+import numpy as np
 import pandas as pd
-from config import COLOR_PARTIDOS
+from typing import Sequence, Union
+from config import COLOR_PARTIDOS, PIXELES_POR_PUNTO
+from analisis_en_profundidad.agregados import ConteosTono
+from analisis_en_profundidad.ranking import top_n
+from analisis_en_profundidad.series_temporales import FRECUENCIAS, serie_tono, submuestrear
 from analisis_en_profundidad.utils import ajustar_nombres_ccaa
 
 
-def calcular_proporcion_tono(
-    df_posts: pd.DataFrame,
-    df_metadata: pd.DataFrame
-) -> pd.DataFrame:
-    """
-    Calcula la proporción de posts de cada tono (Positivo, Negativo, Neutro)
-    para cada político, y añade sus datos de nombre y partido.
-    """
-    tono_posts_politico = (
-        df_posts.groupby(["ID_Político", "Tono"])
-        .size()
-        .reset_index(name="Cantidad")
-    )
-    tono_posts_politico["Proporción"] = tono_posts_politico.groupby("ID_Político")["Cantidad"].transform(
-        lambda x: x / x.sum()
-    )
-
-    return tono_posts_politico.merge(
-        df_metadata[["ID_Político", "Nombre", "Partido"]],
-        on="ID_Político",
-        how="left"
-    )
-
-
-def graficos_proporcion_tono_partido(
-    df_posts: pd.DataFrame,
-    df_metadata: pd.DataFrame
-) -> None:
+def graficos_proporcion_tono_partido(tonos: ConteosTono) -> None:
     """
     Muestra top 10 partidos por proporción de posts según tono.
     """
-    proporciones = calcular_proporcion_tono(df_posts, df_metadata)
-
-    proporcion_partido = (
-        proporciones.groupby(["Partido", "Tono"], as_index=False)["Proporción"]
-        .mean()
-    )
+    proporcion_partido = tonos.proporcion_partido()
 
     for tono in ["Positivo", "Negativo", "Neutro"]:
-        df_tono = (
-            proporcion_partido[proporcion_partido["Tono"] == tono]
-            .sort_values("Proporción", ascending=False)
-            .head(10)
-        )
+        df_tono = proporcion_partido[proporcion_partido["Tono"] == tono]
+        df_tono = df_tono.iloc[top_n(df_tono["Proporción"], 10)]
 
         orden = df_tono["Partido"]
         colores = [COLOR_PARTIDOS.get(p, "#cccccc") for p in df_tono["Partido"]]
@@ -74,21 +44,15 @@ def graficos_proporcion_tono_partido(
         st.plotly_chart(fig)
 
 
-def graficos_proporcion_tono_politico(
-    df_posts: pd.DataFrame,
-    df_metadata: pd.DataFrame
-) -> None:
+def graficos_proporcion_tono_politico(tonos: ConteosTono) -> None:
     """
     Muestra top 10 políticos con mayor proporción de posts según tono.
     """
-    proporciones = calcular_proporcion_tono(df_posts, df_metadata)
+    proporciones = tonos.politico
 
     for tono in ["Positivo", "Negativo", "Neutro"]:
-        df_tono = (
-            proporciones[proporciones["Tono"] == tono]
-            .sort_values("Proporción", ascending=False)
-            .head(10)
-        )
+        df_tono = proporciones[proporciones["Tono"] == tono]
+        df_tono = df_tono.iloc[top_n(df_tono["Proporción"], 10)]
         orden = df_tono["Nombre"]
 
         fig = go.Figure()
@@ -116,29 +80,14 @@ def graficos_proporcion_tono_politico(
 
 
 def graficos_mapa_tono_ccaa(
-    df_posts: pd.DataFrame,
-    df_metadata: pd.DataFrame,
-    geojson_ccaa: dict
+    tonos: ConteosTono,
+    geojson_ccaa: Union[str, dict]
 ) -> None:
     """
     Muestra mapas de colores con proporción de tonos (Positivo, Negativo, Neutro)
     por comunidad autónoma.
     """
-    posts_con_ccaa = df_posts.merge(
-        df_metadata[["ID_Político", "Comunidad Autónoma"]],
-        on="ID_Político",
-        how="left"
-    )
-
-    tono_ccaa = (
-        posts_con_ccaa.groupby(["Comunidad Autónoma", "Tono"])
-        .size()
-        .reset_index(name="Cantidad")
-    )
-    tono_ccaa["Total"] = tono_ccaa.groupby("Comunidad Autónoma")["Cantidad"].transform("sum")
-    tono_ccaa["Proporción"] = tono_ccaa["Cantidad"] / tono_ccaa["Total"]
-
-    tono_ccaa = ajustar_nombres_ccaa(tono_ccaa)
+    tono_ccaa = ajustar_nombres_ccaa(tonos.ccaa.copy())
 
     for tono, escala in zip(["Positivo", "Negativo", "Neutro"], ["Greens", "Reds", "Blues"]):
         df_tono = tono_ccaa[tono_ccaa["Tono"] == tono]
@@ -159,26 +108,13 @@ def graficos_mapa_tono_ccaa(
         st.plotly_chart(fig)
 
 
-def graficar_tono_por_tema_individual(
-    df_posts: pd.DataFrame,
-    df_metadata_filtrado: pd.DataFrame
-) -> None:
+def graficar_tono_por_tema_individual(tonos: ConteosTono) -> None:
     """
     Gráfico pie chart por tema con proporciones de tono
-    (Negativo, Neutro, Positivo), filtrando solo posts
+    (Negativo, Neutro, Positivo), solo con los posts
     de políticos que cumplen los filtros activos.
     """
-    ids_filtrados = df_metadata_filtrado["ID_Político"].unique()
-    df_filtrado_posts = df_posts[df_posts["ID_Político"].isin(ids_filtrados)].copy()
-
-    proporcion = (
-        df_filtrado_posts.groupby(["Tema", "Tono"])
-        .size()
-        .reset_index(name="Cantidad")
-    )
-    proporcion["Proporción"] = proporcion.groupby("Tema")["Cantidad"].transform(
-        lambda x: x / x.sum()
-    )
+    proporcion = tonos.tema
 
     temas = proporcion["Tema"].dropna().unique()
     orden_tonos = ["Negativo", "Neutro", "Positivo"]
@@ -221,3 +157,74 @@ def graficar_tono_por_tema_individual(
         )
         st.plotly_chart(fig)
 
+
+
+def grafico_evolucion_tono(
+    df_metadata: pd.DataFrame,
+    temas: Sequence[str]
+) -> None:
+    """
+    Evolución de la proporción de posts de cada tono por día, semana o mes,
+    agrupando los políticos seleccionados por partido o mostrando políticos
+    concretos, con todos los posts o solo los de un tema.
+    """
+    col_periodo, col_agrupacion, col_tema = st.columns(3)
+    frecuencia = col_periodo.selectbox("Periodo", list(FRECUENCIAS), index=2, key="tono_frecuencia")
+    agrupacion = col_agrupacion.selectbox("Agrupar por", ["Partido", "Político"], key="tono_agrupacion")
+    tema = col_tema.selectbox("Tema", ["Todos"] + list(temas), key="tono_tema")
+
+    serie = serie_tono(None if tema == "Todos" else tema)
+    filas = serie.filas(df_metadata["ID_Político"])
+    if agrupacion == "Partido":
+        codigos, nombres = pd.factorize(df_metadata["Partido"], sort=True)
+        nombres = list(nombres)
+    else:
+        posts = serie.conteos[filas].sum(axis=(1, 2))
+        ids = df_metadata["ID_Político"].astype(object)
+        nombres_por_id = dict(zip(ids, df_metadata["Nombre"]))
+        elegidos = st.multiselect(
+            "Políticos",
+            ids.tolist(),
+            default=[ids.iloc[i] for i in np.argsort(-posts, kind="stable")[:3] if posts[i] > 0],
+            format_func=lambda id_politico: nombres_por_id[id_politico],
+            max_selections=8,
+            key="tono_politicos"
+        )
+        elegidos = [id_politico for id_politico in elegidos if id_politico in nombres_por_id]
+        codigos = np.full(len(filas), -1)
+        codigos[pd.Index(ids).get_indexer(elegidos)] = np.arange(len(elegidos))
+        nombres = [nombres_por_id[id_politico] for id_politico in elegidos]
+    if not nombres:
+        st.info("No hay políticos seleccionados.")
+        return
+
+    fechas, conteos = serie.remuestrear(serie.sumar(filas, np.asarray(codigos), len(nombres)), FRECUENCIAS[frecuencia])
+    totales = conteos.sum(axis=2, keepdims=True)
+    grupo, periodo, tono = np.nonzero(np.broadcast_to(totales > 0, conteos.shape))
+    df_plot = pd.DataFrame({
+        agrupacion: np.asarray(nombres, dtype=object)[grupo],
+        "Fecha": fechas[periodo],
+        "Tono": np.asarray(serie.categorias, dtype=object)[tono],
+        "Posts": conteos[grupo, periodo, tono],
+        "Proporción": conteos[grupo, periodo, tono] / totales[grupo, periodo, 0],
+    })
+    if df_plot.empty:
+        st.info("No hay posts con fecha para la selección actual.")
+        return
+    df_plot = submuestrear(df_plot, "Fecha", "Proporción", [agrupacion, "Tono"], 1000 // PIXELES_POR_PUNTO)
+
+    fig = px.line(
+        df_plot,
+        x="Fecha",
+        y="Proporción",
+        color=agrupacion,
+        facet_row="Tono",
+        hover_data=["Posts"],
+        color_discrete_map=COLOR_PARTIDOS if agrupacion == "Partido" else None,
+        title=f"Evolución del tono de los posts ({frecuencia.lower()})"
+        + ("" if tema == "Todos" else f" · {tema}"),
+        width=1000,
+        height=750
+    )
+    fig.update_yaxes(tickformat=".0%")
+    st.plotly_chart(fig)
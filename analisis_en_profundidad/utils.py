@@ -1,6 +1,7 @@
 import streamlit as st
 import plotly.graph_objects as go
 from config import COLOR_PARTIDOS
+from esquema import NOMBRES_CCAA_GEOJSON
 import pandas as pd
 
 def ajustar_nombres_ccaa(
@@ -9,25 +10,28 @@ def ajustar_nombres_ccaa(
 ) -> pd.DataFrame:
     """
     Corrige nombres de Comunidades Autónomas para
-    unificar criterios con el geojson de mapas.
+    unificar criterios con el geojson de mapas. En columnas categóricas
+    basta con renombrar la tabla de códigos.
     """
-    df[columna] = df[columna].replace({
-        "Castilla-La Mancha": "Castilla - La Mancha"
-    })
+    if isinstance(df[columna].dtype, pd.CategoricalDtype):
+        df[columna] = df[columna].cat.rename_categories(
+            lambda c: NOMBRES_CCAA_GEOJSON.get(c, c)
+        )
+    else:
+        df[columna] = df[columna].replace(NOMBRES_CCAA_GEOJSON)
     return df
 
 
 def plot_top10_bar(
-    df: pd.DataFrame,
+    top10: pd.DataFrame,
     value_col: str,
     title: str,
     yaxis_title: str
 ) -> None:
     """
-    Genera un gráfico de barras top 10 con colores
-    diferenciados por partido.
+    Genera un gráfico de barras de un top de políticos (ya ordenado, ver
+    PlanAgregacion.top) con colores diferenciados por partido.
     """
-    top10 = df[["Nombre", "Partido", value_col]].nlargest(10, value_col)
 
     fig = go.Figure()
 
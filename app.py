@@ -1,6 +1,6 @@
 import streamlit as st
 import pandas as pd
-from data_loader import cargar_datos, cargar_mapa_geojson
+from data_loader import cargar_columnas, fijar_version_datos, obtener_geojson_ccaa
 import controllers as ctrl
 import display as dp
 
@@ -10,10 +10,14 @@ st.set_page_config(
     page_icon="📊"
 )
 
-df_metadata, df_posts, df_comentarios = cargar_datos()
-geojson_ccaa = cargar_mapa_geojson()
+# La versión de los datos (manifiesto y Excel) se consulta una vez por ejecución
+fijar_version_datos()
 
-if df_metadata.empty or df_posts.empty or df_comentarios.empty:
+# Posts y Comentarios los carga cada vista con solo las columnas que usa
+df_metadata = cargar_columnas("Metadata")
+geojson_ccaa = obtener_geojson_ccaa()
+
+if df_metadata.empty:
     st.error("❌ Error al cargar alguno de los datasets. Por favor revisa el archivo.")
     st.stop()
 
@@ -25,6 +29,8 @@ df_filtrado = controller.aplicar_filtros()
 
 opciones_graficas = controller.definir_opciones_graficas(tipo_analisis)
 
+ventana_interaccion = controller.definir_ventana_interaccion(tipo_analisis)
+
 if tipo_analisis == "Análisis en profundidad":
     st.title("📊 Análisis en profundidad de la Actividad Política en X/Twitter")
 else:
@@ -34,6 +40,6 @@ else:
     )
 
 if tipo_analisis == "Análisis en profundidad":
-    dp.mostrar_analisis_en_profundidad(df_filtrado, df_posts, df_comentarios, geojson_ccaa)
+    dp.mostrar_analisis_en_profundidad(df_filtrado, geojson_ccaa, controller.derivado, ventana_interaccion)
 else:
-    dp.mostrar_basico(df_filtrado, tipo_analisis, opciones_graficas, df_posts, df_comentarios)
+    dp.mostrar_basico(df_filtrado, tipo_analisis, opciones_graficas)
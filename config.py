@@ -1,6 +1,6 @@
-import plotly.express as px
 import itertools
-from typing import List, Dict
+import os
+from typing import List, Dict, Optional
 
 COLOR_PARTIDOS: Dict[str, str] = {
     "PSOE": "#ff0000", "PP": "#189ad3", "SUMAR": "#ff0065", "VOX": "#74d600",
@@ -13,6 +13,46 @@ def generar_paleta(categorias: List[str]) -> Dict[str, str]:
     """
     Genera un mapa de colores ciclando colores base para categorías arbitrarias.
     """
-    base = px.colors.qualitative.Set2 + px.colors.qualitative.Pastel
+    from plotly.colors import qualitative
+
+    base = qualitative.Set2 + qualitative.Pastel
     return dict(zip(categorias, itertools.cycle(base)))
 
+
+
+DIR_GEOJSON = "static/geojson"
+# Ruta en la que Streamlit sirve static/ cuando server.enableStaticServing está activo
+URL_GEOJSON = "app/static/geojson"
+
+# Con False la aplicación solo usa los geojson precalculados (preparar_mapas.py)
+# y nunca importa geopandas; con True genera en ejecución las capas que falten
+GENERAR_MAPAS_EN_EJECUCION: bool = False
+
+# Fecha de referencia de las tasas anuales de metricas.py (años en X/Twitter =
+# año de esta fecha - año de comienzo); la hoja de cálculo usa 2025
+FECHA_REFERENCIA_METRICAS: str = "2025-12-31"
+
+# Las series temporales largas se reducen en el servidor (LTTB) a un punto por
+# cada PIXELES_POR_PUNTO píxeles de ancho de la figura
+PIXELES_POR_PUNTO: int = 2
+
+# Nivel de detalle del geojson precalculado según el ancho máximo (px) de la figura
+RESOLUCIONES_MAPA: Dict[str, Optional[int]] = {"baja": 600, "media": 1200, "alta": None}
+
+
+def ruta_geojson(capa: str, nivel: str) -> str:
+    return os.path.join(DIR_GEOJSON, f"{capa}_{nivel}.geojson")
+
+
+def url_geojson(capa: str, nivel: str) -> str:
+    return f"{URL_GEOJSON}/{capa}_{nivel}.geojson"
+
+
+def nivel_para_ancho(ancho: int) -> str:
+    """
+    Devuelve el nivel de detalle más bajo adecuado para una figura de `ancho` píxeles.
+    """
+    for nivel, limite in RESOLUCIONES_MAPA.items():
+        if limite is None or ancho <= limite:
+            return nivel
+    return "alta"
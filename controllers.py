@@ -1,5 +1,11 @@
+import datetime
 import streamlit as st
 import pandas as pd
+from typing import Any, Callable, Optional, Tuple
+from data_loader import obtener_version_datos
+from filtros import (
+    COLUMNAS_MULTIVALOR, COLUMNAS_RANGO, cache_resultados, construir_indice, firma_filtros
+)
 
 class AppController:
     def __init__(self, df_metadata: pd.DataFrame):
@@ -15,6 +21,9 @@ class AppController:
             'Likes', 'Retweets', 'Comentarios_Totales'
         ]
 
+        # Columnas cuyas opciones se muestran sin recuento (una fila por valor)
+        self.sin_recuento = ['Nombre']
+
         self.columnas_filtrables = [
             col for col in df_metadata.columns if col not in self.excluir
         ]
@@ -23,69 +32,117 @@ class AppController:
         ]
 
     def aplicar_filtros(self) -> pd.DataFrame:
-        df_filtrado = self.df_metadata.copy()
+        """
+        Muestra los filtros en cascada (las opciones y rangos de cada uno se
+        calculan sobre lo que dejan los anteriores) y devuelve las filas de
+        Metadata que los cumplen. La selección se mantiene como bitset sobre
+        el índice de filtros y solo se materializa al final. El resultado se
+        guarda en la caché compartida bajo la firma de los filtros activos.
+
+        En el modo "aplicar con botón" los filtros van en un formulario: los
+        cambios se acumulan y la página solo se recalcula al pulsar
+        "Aplicar filtros" (las opciones en cascada se actualizan entonces).
+        No hay cancelación propia de ejecuciones obsoletas: Streamlit detiene
+        la ejecución en curso en la siguiente llamada a st.* tras un cambio,
+        pero no durante un cálculo entre dos llamadas.
+        """
+        indice = construir_indice(self.df_metadata, tuple(self.columnas_filtrables))
+        seleccion = indice.todos()
+        filtros = {}
         st.sidebar.header("🧮 Panel de Filtros")
+        por_lotes = st.sidebar.toggle(
+            "Aplicar filtros con botón",
+            key="filtros_por_lotes",
+            help="Acumula los cambios de los filtros y recalcula los análisis solo al pulsar «Aplicar filtros»."
+        )
+        panel = st.sidebar.form("formulario_filtros", border=False) if por_lotes else st.sidebar
 
         for col in self.columnas_filtrables:
 
-            if col in ['Edad', 'Posts', 'Seguidores', 'Likes', 'Retweets', 'Comentarios_Totales']:
-                min_val, max_val = int(df_filtrado[col].min()), int(df_filtrado[col].max())
+            if col in COLUMNAS_RANGO:
+                extremos = indice.extremos(col, seleccion)
+                if extremos is None:
+                    panel.info(f"{col}: sin valores disponibles")
+                    continue
+                if col == "Comienzo en X/Twitter":
+                    min_val, max_val = extremos
+                    aviso = f"{col}: único valor {min_val}"
+                else:
+                    min_val, max_val = int(extremos[0]), int(extremos[1])
+                    aviso = f"{col}: único valor disponible {min_val}"
                 if min_val == max_val:
-                    st.sidebar.info(f"{col}: único valor disponible {min_val}")
+                    panel.info(aviso)
                     rango = (min_val, max_val)
                 else:
-                    rango = st.sidebar.slider(col, min_val, max_val, (min_val, max_val))
-                df_filtrado = df_filtrado[(df_filtrado[col] >= rango[0]) & (df_filtrado[col] <= rango[1])]
-
-            elif col == "Comienzo en X/Twitter":
-                min_fecha, max_fecha = df_filtrado[col].min(), df_filtrado[col].max()
-                if min_fecha == max_fecha:
-                    st.sidebar.info(f"Comienzo en X/Twitter: único valor {min_fecha}")
-                    fechas = (min_fecha, max_fecha)
-                else:
-                    fechas = st.sidebar.slider(
-                        "Comienzo en X/Twitter", min_fecha, max_fecha, (min_fecha, max_fecha)
-                    )
-                df_filtrado = df_filtrado[
-                    (df_filtrado[col] >= fechas[0]) & (df_filtrado[col] <= fechas[1])
-                ]
-
-            elif col == "Rango_Legislaturas":
-                opciones = df_filtrado[col].dropna().str.split(", ").explode().unique()
-                if len(opciones) == 1:
-                    st.sidebar.info(f"Rango de Legislaturas: único valor disponible {opciones[0]}")
-                    seleccionadas = [opciones[0]]
-                else:
-                    seleccionadas = st.sidebar.multiselect("Rango de Legislaturas", sorted(opciones))
-                if seleccionadas:
-                    df_filtrado = df_filtrado[
-                        df_filtrado[col].fillna("").apply(
-                            lambda x: any(sel in x for sel in seleccionadas)
-                        )
-                    ]
-
-            elif col == "Número de Legislaturas":
-                opciones = sorted(df_filtrado[col].dropna().unique())
-                if len(opciones) == 1:
-                    st.sidebar.info(f"Número de Legislaturas: único valor disponible {opciones[0]}")
-                    seleccionadas = [opciones[0]]
-                else:
-                    seleccionadas = st.sidebar.multiselect("Número de Legislaturas", opciones)
-                if seleccionadas:
-                    df_filtrado = df_filtrado[df_filtrado[col].isin(seleccionadas)]
+                    rango = panel.slider(col, min_val, max_val, (min_val, max_val))
+                # El rango completo también se aplica (descarta los nulos), pero
+                # no forma parte de la firma: no depende de lo elegido
+                if tuple(rango) != (min_val, max_val):
+                    filtros[col] = ("rango", *rango)
+                seleccion = seleccion & indice.por_rango(col, *rango)
 
             else:
-                opciones = df_filtrado[col].dropna().unique()
+                conteos = self._conteos_faceta(indice, col, seleccion, filtros)
+                opciones = list(conteos) if conteos is not None else indice.valores(col, seleccion)
+                etiqueta = "Rango de Legislaturas" if col == "Rango_Legislaturas" else col
                 if len(opciones) == 1:
-                    st.sidebar.info(f"{col}: único valor disponible {opciones[0]}")
+                    panel.info(f"{etiqueta}: único valor disponible {opciones[0]}")
                     seleccionadas = [opciones[0]]
                 else:
-                    seleccionadas = st.sidebar.multiselect(col, sorted(opciones))
+                    seleccionadas = panel.multiselect(
+                        etiqueta,
+                        sorted(opciones),
+                        format_func=(
+                            (lambda v, c=conteos: f"{v} ({c[v][0]} políticos · {c[v][1]} posts)")
+                            if conteos is not None else str
+                        ),
+                        key=f"filtro_{col}"
+                    )
+                todas = False
+                if col in COLUMNAS_MULTIVALOR and len(seleccionadas) > 1:
+                    todas = panel.radio(
+                        f"{etiqueta}: coincidencia",
+                        ["Alguna de las seleccionadas", "Todas las seleccionadas"],
+                        index=0,
+                        horizontal=True
+                    ) == "Todas las seleccionadas"
                 if seleccionadas:
-                    df_filtrado = df_filtrado[df_filtrado[col].isin(seleccionadas)]
+                    filtros[col] = ("todas" if todas else "alguna", seleccionadas)
+                    seleccion = seleccion & indice.por_valores(col, seleccionadas, todas)
+
+        if por_lotes:
+            panel.form_submit_button("Aplicar filtros", type="primary")
 
+        self.firma = firma_filtros(obtener_version_datos(), filtros)
+        filas = self.derivado("filas", lambda: indice.filas(seleccion))
+        df_filtrado = self.derivado("metadata", lambda: self.df_metadata.iloc[filas])
+        self.derivado("ids", lambda: df_filtrado["ID_Político"].to_numpy())
         return df_filtrado
 
+    def _conteos_faceta(self, indice, col: str, seleccion, filtros: dict):
+        """
+        Políticos y posts que daría cada opción de `col` con los filtros ya
+        aplicados. Se leen del cubo de conteos si todos esos filtros son
+        dimensiones del cubo; si hay rangos u otras columnas, se cuentan bits.
+        """
+        if col in self.sin_recuento:
+            return None
+        if (
+            indice.cubo is not None
+            and col in indice.cubo.dimensiones
+            and all(c in indice.cubo.dimensiones and f[0] == "alguna" for c, f in filtros.items())
+        ):
+            return indice.cubo.conteos(col, {c: f[1] for c, f in filtros.items()})
+        return indice.conteos(col, seleccion)
+
+    def derivado(self, nombre: str, calcular: Callable[[], Any]) -> Any:
+        """
+        Resultado derivado de la selección actual (p. ej. los posts de los
+        políticos filtrados), compartido entre sesiones a través de la caché
+        de filtros. Debe llamarse después de aplicar_filtros.
+        """
+        return cache_resultados().obtener(self.firma, nombre, calcular)
+
 
     def definir_tipo_analisis(self) -> str:
         st.sidebar.header("📊 Tipo de análisis")
@@ -96,6 +153,32 @@ class AppController:
         )
         return tipo_analisis
 
+    def definir_ventana_interaccion(self, tipo_grafico: str) -> Optional[Tuple[datetime.date, datetime.date]]:
+        """
+        Periodo de publicación con el que se calcula la interacción en el
+        análisis en profundidad. Devuelve None (todos los posts) si no se
+        limita o mientras el rango de fechas está incompleto.
+        """
+        if tipo_grafico != "Análisis en profundidad":
+            return None
+        from metricas import interaccion_acumulada
+
+        limites = interaccion_acumulada().limites()
+        st.sidebar.header("⏱️ Interacción")
+        if limites is None or not st.sidebar.toggle("Limitar a un periodo de publicación", key="ventana_activa"):
+            return None
+
+        seleccion = st.sidebar.date_input(
+            "Posts publicados entre",
+            value=limites,
+            min_value=limites[0],
+            max_value=limites[1],
+            key="ventana_interaccion"
+        )
+        if len(seleccion) != 2:
+            return None
+        return tuple(seleccion)
+
     def definir_opciones_graficas(self, tipo_grafico: str) -> list:
         """
         Devuelve las opciones de gráficas a mostrar en el análisis básico,
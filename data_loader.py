@@ -1,45 +1,331 @@
+import hashlib
+import json
+import os
 import pandas as pd
-import geopandas as gpd
-from shapely import affinity
+import pyarrow as pa
 import streamlit as st
-from typing import Tuple
+from typing import Dict, Optional, Sequence, Tuple, Union
+from config import GENERAR_MAPAS_EN_EJECUCION, nivel_para_ancho, ruta_geojson, url_geojson
+from almacen import (
+    COLUMNA_PARTICION, HOJAS, HOJAS_PARTICIONADAS, VERSION_SNAPSHOT, columnas_tabla,
+    escribir_manifiesto, escribir_particionado, escribir_tabla, escribir_vocabulario,
+    existe_tabla, leer_manifiesto, leer_tabla, leer_vocabulario, mes_particion,
+    normalizar_para_arrow
+)
+from esquema import CLAVES_COMPARTIDAS, a_entero, aplicar_esquema, categorias_compartidas
+from ingesta import (
+    COLUMNAS_TOKENS, AgregadosIncrementales, ColumnaTokens, codificar_tokens, a_lista_arrow,
+    desde_lista_arrow
+)
 
-@st.cache_data
-def cargar_datos() -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+RUTA_DATOS = "datasets/politicos_etiquetado_final.xlsx"
+# Clave de session_state con la versión de los datos de la ejecución en curso
+CLAVE_VERSION = "version_datos"
+
+
+def _hash_contenido(ruta: str, bloque: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for trozo in iter(lambda: f.read(bloque), b""):
+            h.update(trozo)
+    return h.hexdigest()
+
+
+def calcular_version_datos(ruta: str = RUTA_DATOS) -> str:
+    """
+    Calcula la versión de los datos: la del snapshot (manifiesto "sha256")
+    mientras el Excel de origen sea el mismo con el que se generó, o el hash de
+    contenido del Excel si ha cambiado. El manifiesto guarda aparte el hash del
+    Excel ("sha256_origen"), porque cada anexo de datos nuevos
+    (ingesta.anexar) cambia la versión del snapshot pero no el Excel. Si mtime
+    y tamaño coinciden con los guardados no se relee el archivo; si no, se
+    recalcula su hash y solo un contenido distinto invalida el snapshot.
+    Si el almacén se generó por ingesta en flujo (ingesta.py), su versión es la
+    registrada en el manifiesto y el Excel no se consulta.
+    """
+    manifiesto = leer_manifiesto()
+    if manifiesto.get("origen") == "flujo":
+        return manifiesto["sha256"]
+
+    info = os.stat(ruta)
+    if manifiesto.get("mtime") == info.st_mtime_ns and manifiesto.get("tamaño") == info.st_size:
+        return manifiesto["sha256"]
+
+    version = _hash_contenido(ruta)
+    if manifiesto.get("sha256_origen", manifiesto.get("sha256")) == version:
+        manifiesto.update(mtime=info.st_mtime_ns, tamaño=info.st_size)
+        escribir_manifiesto(manifiesto)
+        return manifiesto["sha256"]
+    return version
+
+
+def fijar_version_datos() -> str:
+    """
+    Calcula la versión de los datos una sola vez por ejecución del script
+    (al principio de app.py) y la guarda en session_state, de donde la leen
+    el resto de cachés durante esa ejecución.
+    """
+    version = calcular_version_datos()
+    st.session_state[CLAVE_VERSION] = version
+    return version
+
+
+def obtener_version_datos(ruta: str = RUTA_DATOS) -> str:
+    """
+    Devuelve la versión de los datos fijada en esta ejecución por
+    fijar_version_datos. Fuera de la app (scripts, CLI) o con otra ruta se
+    calcula en el momento.
+    """
+    if ruta == RUTA_DATOS and st.runtime.exists() and CLAVE_VERSION in st.session_state:
+        return st.session_state[CLAVE_VERSION]
+    return calcular_version_datos(ruta)
+
+
+def _snapshot_vigente(version: str) -> bool:
+    manifiesto = leer_manifiesto()
+    return (
+        manifiesto.get("formato") == VERSION_SNAPSHOT
+        and manifiesto.get("sha256") == version
+        and all(existe_tabla(hoja) for hoja in HOJAS)
+        and existe_tabla("vocabulario")
+        and existe_tabla("agregados_politico")
+        and existe_tabla("agregados_tema")
+    )
+
+
+def _escribir_snapshot(hojas: Dict[str, pd.DataFrame], ruta: str, version: str) -> None:
+    """
+    Guarda cada hoja como Arrow IPC sin comprimir (mapeable en memoria), con
+    Posts y Comentarios particionados por mes, junto con los agregados que
+    ingesta.anexar actualiza después por delta, y registra en el manifiesto la
+    versión del Excel de origen. Las columnas de tokens se guardan ya parseadas
+    como list<int32> sobre un vocabulario común.
+    """
+    vocabulario, codificadas = codificar_tokens({
+        col: hojas[hoja][col]
+        for hoja, columnas in COLUMNAS_TOKENS.items()
+        for col in columnas if col in hojas[hoja].columns
+    })
+    escribir_vocabulario(vocabulario)
+
+    agregados = AgregadosIncrementales()
+    agregados.actualizar_posts(hojas["Posts"])
+
+    for hoja, df in hojas.items():
+        tabla = pa.Table.from_pandas(normalizar_para_arrow(df), preserve_index=False)
+        for col in COLUMNAS_TOKENS.get(hoja, []):
+            if col in codificadas:
+                tabla = tabla.set_column(
+                    tabla.schema.get_field_index(col), col, a_lista_arrow(*codificadas[col])
+                )
+        if hoja in HOJAS_PARTICIONADAS:
+            escribir_particionado(tabla, hoja, mes_particion(df[COLUMNA_PARTICION]), reemplazar=True)
+        else:
+            escribir_tabla(tabla, hoja)
+    agregados.guardar()
+
+    info = os.stat(ruta)
+    escribir_manifiesto({
+        "formato": VERSION_SNAPSHOT,
+        "origen": ruta,
+        "sha256": version,
+        "sha256_origen": version,
+        "mtime": info.st_mtime_ns,
+        "tamaño": info.st_size,
+        "hojas": list(hojas),
+    })
+
+
+def _leer_snapshot(hoja: str, columnas: Optional[list] = None) -> pd.DataFrame:
+    """
+    Lee una hoja del snapshot. Por defecto se omiten las columnas de tokens,
+    que se consumen codificadas a través de cargar_tokens.
+    """
+    if columnas is None:
+        columnas = [c for c in columnas_tabla(hoja) if c not in COLUMNAS_TOKENS.get(hoja, [])]
+    return leer_tabla(hoja, columnas).to_pandas()
+
+
+def _superponer_agregados(metadata: pd.DataFrame) -> pd.DataFrame:
+    """
+    Sustituye en Metadata las sumas por político, Posts_extraidos y la
+    interacción por las del almacén, que incluyen los posts anexados.
+    """
+    agregados = leer_tabla("agregados_politico").to_pandas().set_index("ID_Político")
+    ids = metadata["ID_Político"].astype(object)
+    metadata = metadata.copy()
+    for col in agregados.columns.intersection(metadata.columns):
+        valores = ids.map(agregados[col]).fillna(metadata[col])
+        # Las sumas con los posts anexados pueden no caber en el tipo guardado
+        if pd.api.types.is_integer_dtype(metadata[col]):
+            metadata[col] = a_entero(valores)
+        else:
+            metadata[col] = valores.astype(metadata[col].dtype)
+    if {"Interacción", "Seguidores", "Interacción_Relativa"} <= set(metadata.columns):
+        metadata["Interacción_Relativa"] = metadata["Interacción"] / metadata["Seguidores"].where(metadata["Seguidores"] > 0)
+    return metadata
+
+
+@st.cache_data(show_spinner=False)
+def _preparar_snapshot(version: str) -> Optional[Dict[str, pd.DataFrame]]:
+    """
+    Regenera el snapshot columnar desde el Excel si no está vigente para esta
+    versión. Solo si no se pudo guardar devuelve las hojas leídas en memoria
+    (ya con el esquema aplicado) para servir las vistas desde ellas.
+    """
+    if _snapshot_vigente(version):
+        return None
+    anexos = leer_manifiesto().get("anexos")
+    if anexos:
+        st.warning(
+            f"El Excel de origen ha cambiado: el snapshot se regenera a partir de él "
+            f"y se descartan los {anexos} anexos de datos añadidos con ingesta.anexar."
+        )
+    hojas = aplicar_esquema(pd.read_excel(RUTA_DATOS, sheet_name=list(HOJAS)))
+    try:
+        _escribir_snapshot(hojas, RUTA_DATOS, version)
+    except (OSError, pa.ArrowException) as e:
+        st.warning(f"No se pudo guardar el snapshot columnar de los datos: {e}")
+        return {hoja: df.drop(columns=COLUMNAS_TOKENS.get(hoja, []), errors="ignore") for hoja, df in hojas.items()}
+    return None
+
+
+@st.cache_data(show_spinner=False)
+def _categorias_compartidas_version(version: str) -> Dict[str, list]:
+    """
+    Tablas de códigos de las claves compartidas entre hojas, leyendo del
+    almacén solo esas columnas, para que cada proyección use los mismos códigos.
+    """
+    return categorias_compartidas({
+        hoja: _leer_snapshot(hoja, [col for col in CLAVES_COMPARTIDAS if col in columnas_tabla(hoja)])
+        for hoja in HOJAS
+    })
+
+
+@st.cache_data(show_spinner=False)
+def _cargar_columnas_version(version: str, hoja: str, columnas: Optional[Tuple[str, ...]]) -> pd.DataFrame:
+    """
+    Materializa una proyección de una hoja: solo se leen del almacén las
+    columnas pedidas (todas salvo las de tokens si columnas es None), con los
+    tipos de esquema.ESQUEMA. Las filas siguen el orden del almacén (por
+    mes), que es el de cargar_tokens, así que la posición sirve de clave.
+    """
+    en_memoria = _preparar_snapshot(version)
+    if en_memoria is not None:
+        df = en_memoria[hoja]
+        return df if columnas is None else df[list(columnas)]
+
+    df = _leer_snapshot(hoja, None if columnas is None else list(columnas))
+    if hoja == "Metadata" and leer_manifiesto().get("anexos") and "ID_Político" in df.columns:
+        df = _superponer_agregados(df)
+    return aplicar_esquema({hoja: df}, _categorias_compartidas_version(version))[hoja]
+
+
+def cargar_columnas(hoja: str, columnas: Optional[Sequence[str]] = None) -> pd.DataFrame:
     """
-    Carga los datos de Excel con un spinner clásico
+    Carga bajo demanda las columnas indicadas de una hoja (Metadata, Posts o
+    Comentarios). Se leen del snapshot Arrow en disco y solo se recurre al
+    Excel cuando este ha cambiado.
     """
     try:
         with st.spinner("Cargando datos..."):
-            ruta = "datasets/politicos_etiquetado_final.xlsx"
-            df_metadata = pd.read_excel(ruta, sheet_name="Metadata")
-            df_posts = pd.read_excel(ruta, sheet_name="Posts")
-            df_comentarios = pd.read_excel(ruta, sheet_name="Comentarios")
-        return df_metadata, df_posts, df_comentarios
+            return _cargar_columnas_version(
+                obtener_version_datos(), hoja, None if columnas is None else tuple(columnas)
+            )
     except FileNotFoundError:
-        st.error(f"No se encontró el archivo de datos en {ruta}")
-        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+        st.error(f"No se encontró el archivo de datos en {RUTA_DATOS}")
+        return pd.DataFrame(columns=columnas)
+
+
+@st.cache_data(show_spinner=False)
+def _cargar_agregados_version(version: str, nombre: str) -> pd.DataFrame:
+    """
+    Agregados de Posts mantenidos por delta en el almacén (ver
+    ingesta.AgregadosIncrementales). Si no se pudo guardar el snapshot se
+    calculan una vez de la hoja Posts en memoria.
+    """
+    en_memoria = _preparar_snapshot(version)
+    if en_memoria is None:
+        return leer_tabla(nombre).to_pandas()
+    agregados = AgregadosIncrementales()
+    agregados.actualizar_posts(en_memoria["Posts"])
+    return agregados.resultado() if nombre == "agregados_politico" else agregados.resultado_temas()
+
+
+def cargar_agregados(nombre: str) -> pd.DataFrame:
+    """
+    Devuelve una tabla de agregados de Posts: "agregados_politico" (sumas de
+    interacción, Posts_extraidos y posts por tono de cada político) o
+    "agregados_tema" (posts por político, tema y tono).
+    """
+    return _cargar_agregados_version(obtener_version_datos(), nombre)
+
+
+def cargar_datos() -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Carga las tres hojas completas (sin las columnas de tokens).
+    """
+    return tuple(cargar_columnas(hoja) for hoja in HOJAS)
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _cargar_tokens_version(version: str) -> Dict[str, ColumnaTokens]:
+    """
+    Columnas de tokens y entidades codificadas de una versión de los datos,
+    leídas del snapshot (sin copia) o parseadas desde el Excel si no lo hay.
+    """
+    if _snapshot_vigente(version):
+        vocabulario = leer_vocabulario()
+        codificadas = {}
+        for hoja, columnas in COLUMNAS_TOKENS.items():
+            tabla = leer_tabla(hoja, columnas)
+            codificadas.update({col: desde_lista_arrow(tabla[col]) for col in columnas})
+    else:
+        hojas = pd.read_excel(RUTA_DATOS, sheet_name=list(COLUMNAS_TOKENS))
+        vocabulario, codificadas = codificar_tokens({
+            col: hojas[hoja][col] for hoja, columnas in COLUMNAS_TOKENS.items() for col in columnas
+        })
+    return {col: ColumnaTokens(ids, offsets, vocabulario) for col, (ids, offsets) in codificadas.items()}
+
+
+def cargar_tokens() -> Dict[str, ColumnaTokens]:
+    """
+    Devuelve las columnas de tokens/entidades de Posts y Comentarios codificadas,
+    alineadas por posición con las filas de cargar_columnas.
+    """
+    return _cargar_tokens_version(obtener_version_datos())
 
 
 @st.cache_data
-def cargar_mapa_geojson() -> dict:
+def cargar_mapa_geojson(ancho: int = 1000) -> dict:
     """
-    Carga y transforma el shapefile a geojson
+    Carga el geojson de CCAA precalculado (Canarias desplazada, EPSG:4326)
+    con el nivel de detalle adecuado al ancho de la figura. Si aún no se ha
+    generado, se prepara en el momento con preparar_mapas solo cuando
+    GENERAR_MAPAS_EN_EJECUCION lo permite.
     """
+    ruta = ruta_geojson("ccaa", nivel_para_ancho(ancho))
     try:
-        ruta_shp = "mapas/ComunidadesAutonomas_ETRS89_30N/Comunidades_Autonomas_ETRS89_30N.shp"
-        gdf = gpd.read_file(ruta_shp)
+        if not os.path.exists(ruta):
+            if not GENERAR_MAPAS_EN_EJECUCION:
+                raise FileNotFoundError("falta el geojson precalculado de CCAA (ejecuta python preparar_mapas.py)")
+            import preparar_mapas
+            preparar_mapas.preparar_ccaa()
+        with open(ruta, encoding="utf-8") as f:
+            return json.load(f)
     except Exception as e:
-        st.error(f"No se pudo leer el shapefile: {e}")
+        st.error(f"No se pudo cargar el mapa: {e}")
         return {}
 
-    try:
-        idx_canarias = gdf[gdf["Texto"] == "Canarias"].index[0]
-        gdf.loc[idx_canarias, "geometry"] = affinity.translate(
-            gdf.loc[idx_canarias, "geometry"], xoff=550_000, yoff=750_000
-        )
-        gdf = gdf.to_crs(epsg=4326)
-        return gdf.__geo_interface__
-    except Exception as e:
-        st.error(f"Error al transformar el mapa: {e}")
-        return {}
+
+def obtener_geojson_ccaa(ancho: int = 1000) -> Union[str, dict]:
+    """
+    Geometría de CCAA para px.choropleth. Con el servido estático activo se
+    devuelve la URL del geojson precalculado: el navegador lo descarga una vez
+    y lo reutiliza en todos los mapas, que solo envían sus valores por región.
+    Si no, se devuelve el geojson completo para incrustarlo en cada figura.
+    """
+    nivel = nivel_para_ancho(ancho)
+    if st.get_option("server.enableStaticServing") and os.path.exists(ruta_geojson("ccaa", nivel)):
+        return url_geojson("ccaa", nivel)
+    return cargar_mapa_geojson(ancho)
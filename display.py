@@ -1,18 +1,25 @@
 import streamlit as st
-import visualizaciones_basicas as vb
-import analisis_en_profundidad.popularidad_actividad as pop
-import analisis_en_profundidad.interaccion_impacto as inter
-import analisis_en_profundidad.tono_discurso as tono
-import analisis_en_profundidad.contenido_tokens as cont
 import pandas as pd
+import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from data_loader import cargar_columnas
+
+# Columnas de Posts y Comentarios que usa cada vista: solo esas se leen del
+# almacén, y únicamente cuando la vista se muestra
+COLUMNAS_CONTENIDO: Dict[str, List[str]] = {
+    "Posts": ["ID_Político", "Enlace_Post", "Tono", "Tema"],
+    "Comentarios": ["Enlace_Post", "Tono", "Tono_Respuesta"],
+}
+
+
+def cargar_vista(columnas: Dict[str, List[str]]) -> Dict[str, pd.DataFrame]:
+    return {hoja: cargar_columnas(hoja, cols) for hoja, cols in columnas.items()}
 
 
 def mostrar_basico(
     df_filtrado: pd.DataFrame,
     tipo_grafico: str,
-    opciones_graficas: list,
-    df_posts: pd.DataFrame,
-    df_comentarios: pd.DataFrame
+    opciones_graficas: list
 ):
     """
     Análisis básico:
@@ -20,10 +27,14 @@ def mostrar_basico(
     - Serie temporal de actividad
     - Tabla de metadata
     """
+    # Los módulos de cada vista (y plotly) se importan al mostrarla por
+    # primera vez, no al arrancar la aplicación
+    import visualizaciones_basicas as vb
+
     vb.mostrar_graficos_basicos(df_filtrado, tipo_grafico, opciones_graficas)
 
     if "Actividad temporal" in opciones_graficas:
-        vb.mostrar_actividad_temporal(df_posts, df_comentarios)
+        vb.mostrar_actividad_temporal(df_filtrado)
 
     if "Tabla de metadata" in opciones_graficas:
         vb.mostrar_tabla_metadata(df_filtrado)
@@ -31,23 +42,52 @@ def mostrar_basico(
 
 def mostrar_analisis_en_profundidad(
     df_filtrado: pd.DataFrame,
-    df_posts: pd.DataFrame,
-    df_comentarios: pd.DataFrame,
-    geojson_ccaa: dict
+    geojson_ccaa: Union[str, dict],
+    derivado: Optional[Callable[[str, Callable[[], Any]], Any]] = None,
+    ventana_interaccion: Optional[Tuple[datetime.date, datetime.date]] = None
 ):
     """
     Análisis avanzado completo:
-    organizado en 4 bloques temáticos y subapartados con expanders
+    organizado en 4 bloques temáticos y subapartados con expanders.
+    El bloque de contenido carga sus propias columnas de posts y comentarios
+    (los tokens solo se leen ahí); el de tono usa las matrices de conteos.
+    Las métricas derivadas (tasas e interacción) se recalculan con
+    metricas.aplicar_metricas; con `ventana_interaccion` la interacción se
+    limita a los posts publicados en ese periodo. Las agregaciones por partido, comunidad y
+    político se calculan una vez (PlanAgregacion, ConteosTono) y, con
+    `derivado` (AppController.derivado), se reutilizan mientras no cambien
+    los filtros.
     """
+    from analisis_en_profundidad.agregados import ConteosTono, PlanAgregacion, matriz_tono
+    from analisis_en_profundidad.ranking import ordenes_politicos
+    from metricas import aplicar_metricas, aplicar_ventana
+    import analisis_en_profundidad.popularidad_actividad as pop
+    import analisis_en_profundidad.interaccion_impacto as inter
+    import analisis_en_profundidad.tono_discurso as tono
+    import analisis_en_profundidad.contenido_tokens as cont
+
+    if derivado is None:
+        def derivado(nombre, calcular):
+            return calcular()
+    df_filtrado = aplicar_metricas(df_filtrado)
+    nombre_plan = "plan_agregacion"
+    # Los órdenes precalculados de los políticos valen para toda la Metadata
+    # salvo que la interacción se limite a un periodo
+    ordenes = ordenes_politicos()
+    if ventana_interaccion is not None:
+        df_filtrado = aplicar_ventana(df_filtrado, *ventana_interaccion)
+        nombre_plan += "_{}_{}".format(*ventana_interaccion)
+        ordenes = None
+    plan = derivado(nombre_plan, lambda: PlanAgregacion(df_filtrado, ordenes))
 
     with st.expander("👤 Popularidad y Actividad"):
         with st.expander("📈 Popularidad"):
-            pop.grafico_top10_politicos_seguidores(df_filtrado)
-            pop.grafico_top10_partidos_seguidores(df_filtrado)
-            pop.grafico_top10_tasa_seguidores(df_filtrado)
-            pop.grafico_top10_tasa_seguidores_partido(df_filtrado)
+            pop.grafico_top10_politicos_seguidores(plan)
+            pop.grafico_top10_partidos_seguidores(plan)
+            pop.grafico_top10_tasa_seguidores(plan)
+            pop.grafico_top10_tasa_seguidores_partido(plan)
             pop.mapa_variable_ccaa(
-                df_filtrado, geojson_ccaa,
+                plan, geojson_ccaa,
                 variable="Seguidores",
                 aggfunc="mean",
                 round_decimals=0,
@@ -56,12 +96,12 @@ def mostrar_analisis_en_profundidad(
                 label="Seguidores promedio"
             )
         with st.expander("📝 Actividad"):
-            pop.grafico_top10_politicos_posts(df_filtrado)
-            pop.grafico_top10_partidos_posts(df_filtrado)
-            pop.grafico_top10_tasa_posts(df_filtrado)
-            pop.grafico_top10_tasa_posts_partido(df_filtrado)
+            pop.grafico_top10_politicos_posts(plan)
+            pop.grafico_top10_partidos_posts(plan)
+            pop.grafico_top10_tasa_posts(plan)
+            pop.grafico_top10_tasa_posts_partido(plan)
             pop.mapa_variable_ccaa(
-                df_filtrado, geojson_ccaa,
+                plan, geojson_ccaa,
                 variable="Posts",
                 aggfunc="mean",
                 round_decimals=0,
@@ -72,13 +112,13 @@ def mostrar_analisis_en_profundidad(
 
     with st.expander("🔁 Interacción e Impacto"):
         with st.expander("💬 Interacción absoluta"):
-            inter.grafico_top10_interaccion(df_filtrado)
-            inter.grafico_top10_interaccion_partido(df_filtrado)
+            inter.grafico_top10_interaccion(plan)
+            inter.grafico_top10_interaccion_partido(plan)
         with st.expander("📊 Interacción relativa"):
-            inter.grafico_top10_interaccion_relativa_politicos(df_filtrado)
-            inter.grafico_top10_interaccion_relativa_partidos(df_filtrado)
+            inter.grafico_top10_interaccion_relativa_politicos(plan)
+            inter.grafico_top10_interaccion_relativa_partidos(plan)
             pop.mapa_variable_ccaa(
-                df_filtrado, geojson_ccaa,
+                plan, geojson_ccaa,
                 variable="Interacción_Relativa",
                 aggfunc="mean",
                 round_decimals=3,
@@ -88,15 +128,20 @@ def mostrar_analisis_en_profundidad(
             )
 
     with st.expander("🗣️ Tono del Discurso"):
+        tonos = derivado("conteos_tono", lambda: ConteosTono(df_filtrado, matriz_tono()))
         with st.expander("📊 Proporción de tono"):
-            tono.graficos_proporcion_tono_partido(df_posts, df_filtrado)
-            tono.graficos_proporcion_tono_politico(df_posts, df_filtrado)
+            tono.graficos_proporcion_tono_partido(tonos)
+            tono.graficos_proporcion_tono_politico(tonos)
         with st.expander("🗺️ Tono por territorio"):
-            tono.graficos_mapa_tono_ccaa(df_posts, df_filtrado, geojson_ccaa)
+            tono.graficos_mapa_tono_ccaa(tonos, geojson_ccaa)
         with st.expander("📚 Tono por tema"):
-            tono.graficar_tono_por_tema_individual(df_posts, df_filtrado)
+            tono.graficar_tono_por_tema_individual(tonos)
+        with st.expander("📈 Evolución del tono"):
+            tono.grafico_evolucion_tono(df_filtrado, matriz_tono().temas)
 
     with st.expander("🧾 Contenido: Palabras clave y Entidades"):
+        contenido = cargar_vista(COLUMNAS_CONTENIDO)
+        df_posts, df_comentarios = contenido["Posts"], contenido["Comentarios"]
         with st.expander("🔠 Frecuencias"):
             cont.analizar_tokens_entidades(df_posts, df_comentarios, df_filtrado)
             cont.analizar_tokens_entidades_por_tono(df_posts, df_comentarios, df_filtrado)
@@ -0,0 +1,164 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+from config import COLOR_PARTIDOS
+
+TONOS: List[str] = ["Positivo", "Negativo", "Neutro"]
+
+COMUNIDADES: List[str] = [
+    "Andalucía", "Aragón", "Principado de Asturias", "Islas Baleares", "Canarias",
+    "Cantabria", "Castilla y León", "Castilla-La Mancha", "Cataluña",
+    "Comunidad Valenciana", "Extremadura", "Galicia", "Comunidad de Madrid",
+    "Región de Murcia", "Comunidad Foral de Navarra", "País Vasco", "La Rioja",
+    "Ceuta", "Melilla",
+]
+
+# Nombres de los datasets que difieren de la propiedad "Texto" del geojson
+NOMBRES_CCAA_GEOJSON: Dict[str, str] = {
+    "Castilla-La Mancha": "Castilla - La Mancha",
+}
+
+# Por hoja: columnas categóricas (con sus categorías fijas, o None si se
+# derivan de los datos) y contadores enteros que se guardan en el tipo más
+# pequeño que los representa, sin bajar de ENTERO_MINIMO.
+ESQUEMA: Dict[str, Dict[str, dict]] = {
+    "Metadata": {
+        "categorias": {
+            "ID_Político": None,
+            "Partido": list(COLOR_PARTIDOS),
+            "Comunidad Autónoma": COMUNIDADES,
+        },
+        "enteros": [
+            "Edad", "Posts", "Seguidores", "Comienzo en X/Twitter", "Likes",
+            "Retweets", "Comentarios_Totales", "Posts_extraidos",
+        ],
+    },
+    "Posts": {
+        "categorias": {
+            "ID_Político": None,
+            "Enlace_Post": None,
+            "Tono": TONOS,
+            "Tema": None,
+        },
+        "enteros": ["Likes", "Retweets", "Comentarios_Totales"],
+    },
+    "Comentarios": {
+        "categorias": {
+            "Enlace_Post": None,
+            "Tono": TONOS,
+            "Tono_Respuesta": TONOS,
+        },
+        "enteros": [],
+    },
+}
+
+# Los enteros no bajan de int32 para que las sumas y los datos anexados
+# después no se salgan del rango del tipo
+ENTERO_MINIMO = np.int32
+
+# Columnas que comparten tabla de códigos entre hojas, para que los cruces
+# (Metadata-Posts por político, Posts-Comentarios por post) sean por código
+CLAVES_COMPARTIDAS: Dict[str, List[str]] = {
+    "ID_Político": ["Metadata", "Posts"],
+    "Enlace_Post": ["Posts", "Comentarios"],
+}
+
+
+def ordenar_categorias(valores: pd.Series, fijas: Optional[List[str]]) -> list:
+    """
+    Tabla de códigos estable: primero las categorías declaradas, en su orden,
+    y después cualquier otro valor presente en los datos, ordenado.
+    """
+    presentes = pd.unique(valores.dropna())
+    if fijas is None:
+        return sorted(presentes, key=str)
+    extra = sorted(set(presentes) - set(fijas), key=str)
+    return list(fijas) + extra
+
+
+def a_entero(serie: pd.Series) -> pd.Series:
+    """
+    Convierte una columna numérica al entero más pequeño que representa sus
+    valores, nunca menor que ENTERO_MINIMO. Si los valores ya no caben en el
+    tipo actual se amplía en lugar de truncarlos; con nulos queda en float.
+    """
+    if serie.isna().any():
+        return serie
+    convertida = pd.to_numeric(serie, downcast="integer")
+    return convertida.astype(np.promote_types(convertida.dtype, ENTERO_MINIMO))
+
+
+def _a_categorica(serie: pd.Series, categorias: list) -> pd.Series:
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.cat.set_categories(categorias)
+    return pd.Series(pd.Categorical(serie, categories=categorias), index=serie.index, name=serie.name)
+
+
+def categorias_compartidas(hojas: Dict[str, pd.DataFrame]) -> Dict[str, list]:
+    """
+    Tabla de códigos común de cada clave de CLAVES_COMPARTIDAS no numérica.
+    """
+    compartidas = {}
+    for col, nombres in CLAVES_COMPARTIDAS.items():
+        presentes = [hojas[h][col] for h in nombres if h in hojas and col in hojas[h].columns]
+        if presentes and not all(pd.api.types.is_numeric_dtype(s) for s in presentes):
+            compartidas[col] = ordenar_categorias(pd.concat([s.astype(object) for s in presentes]), None)
+    return compartidas
+
+
+def aplicar_esquema(
+    hojas: Dict[str, pd.DataFrame],
+    compartidas: Optional[Dict[str, list]] = None
+) -> Dict[str, pd.DataFrame]:
+    """
+    Convierte las columnas declaradas en ESQUEMA a categóricas y los
+    contadores enteros al tipo más pequeño que los representa, desde int32
+    (ver a_entero). Las tablas de
+    códigos de las claves compartidas se calculan sobre las hojas recibidas
+    salvo que se pasen en `compartidas` (al cargar solo parte de una hoja).
+    """
+    hojas = {hoja: df.copy() for hoja, df in hojas.items()}
+    if compartidas is None:
+        compartidas = categorias_compartidas(hojas)
+
+    for hoja, df in hojas.items():
+        definicion = ESQUEMA.get(hoja, {})
+        for col, fijas in definicion.get("categorias", {}).items():
+            if col not in df.columns:
+                continue
+            if col in CLAVES_COMPARTIDAS:
+                if col in compartidas:
+                    df[col] = _a_categorica(df[col], compartidas[col])
+                else:
+                    df[col] = a_entero(df[col])
+            else:
+                df[col] = _a_categorica(df[col], ordenar_categorias(df[col], fijas))
+
+        for col in definicion.get("enteros", []):
+            if col in df.columns and pd.api.types.is_integer_dtype(df[col]):
+                df[col] = a_entero(df[col])
+    return hojas
+
+
+def informe_memoria(antes: pd.DataFrame, despues: pd.DataFrame) -> pd.DataFrame:
+    """
+    Memoria por columna (bytes) antes y después de aplicar el esquema.
+    """
+    informe = pd.DataFrame({
+        "Antes": antes.memory_usage(deep=True, index=False),
+        "Después": despues.memory_usage(deep=True, index=False),
+    })
+    informe["Tipo"] = despues.dtypes.astype(str)
+    informe["Ahorro (%)"] = (100 * (1 - informe["Después"] / informe["Antes"])).round(1)
+    return informe.rename_axis("Columna").reset_index()
+
+
+if __name__ == "__main__":
+    from data_loader import RUTA_DATOS, HOJAS
+
+    originales = pd.read_excel(RUTA_DATOS, sheet_name=list(HOJAS))
+    compactas = aplicar_esquema(originales)
+    for hoja in HOJAS:
+        informe = informe_memoria(originales[hoja], compactas[hoja])
+        print(f"\n{hoja}: {informe['Antes'].sum():,} -> {informe['Después'].sum():,} bytes")
+        print(informe.to_string(index=False))
@@ -0,0 +1,392 @@
+"""
+Índice de filtros sobre Metadata: un bitset por valor de cada columna
+categórica y los valores ordenados (con su posición de fila) de cada columna
+de rango. Las columnas multivalor ("X, XI, XII") se parsean una vez en una
+matriz de pertenencia dispersa valor -> filas. Los filtros activos se combinan
+con AND bit a bit y solo al final se materializa la selección de filas.
+"""
+import sys
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import streamlit as st
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+from data_loader import cargar_columnas, obtener_version_datos
+
+COLUMNAS_RANGO: List[str] = [
+    "Edad", "Posts", "Seguidores", "Likes", "Retweets", "Comentarios_Totales", "Comienzo en X/Twitter"
+]
+COLUMNAS_MULTIVALOR: Dict[str, str] = {"Rango_Legislaturas": ","}
+# Dimensiones categóricas del cubo de conteos de las facetas del panel de filtros
+DIMENSIONES_CUBO: List[str] = [
+    "Partido", "Comunidad Autónoma", "Género", "Estudios", "Rango_Edad", "Número de Legislaturas",
+    "Rango_Seguidores", "Rango_Posts", "Comienzo en X/Twitter rango",
+]
+COLUMNA_POSTS_CUBO = "Posts_extraidos"
+
+MAX_ENTRADAS_CACHE = 256
+MAX_BYTES_CACHE = 256 * 1024 * 1024
+
+
+def _empaquetar(mascara: np.ndarray) -> np.ndarray:
+    return np.packbits(mascara)
+
+
+class MatrizPertenencia:
+    """
+    Matriz dispersa (CSR) de pertenencia valor -> filas de una columna
+    multivalor con elementos separados por `separador`: las filas que
+    contienen el valor k son filas_csr[indptr[k]:indptr[k + 1]]. La
+    pertenencia es exacta por elemento ("XI" no coincide con "XIV").
+    """
+
+    def __init__(self, serie: pd.Series, separador: str):
+        elementos = serie.reset_index(drop=True).dropna().astype(str).str.split(separador).explode().str.strip()
+        pares = pd.DataFrame({"fila": elementos.index, "valor": elementos.to_numpy()})
+        pares = pares[pares["valor"] != ""].drop_duplicates()
+        codigos, valores = pd.factorize(pares["valor"])
+        filas = pares["fila"].to_numpy(dtype=np.int64)
+        orden = np.lexsort((filas, codigos))
+        self.valores: List[str] = list(valores)
+        self.codigos: Dict[str, int] = {valor: k for k, valor in enumerate(self.valores)}
+        self.indptr = np.concatenate(([0], np.cumsum(np.bincount(codigos, minlength=len(valores)))))
+        self.filas_csr = filas[orden]
+
+    def filas(self, valor: str) -> np.ndarray:
+        k = self.codigos.get(valor)
+        if k is None:
+            return np.empty(0, dtype=np.int64)
+        return self.filas_csr[self.indptr[k]:self.indptr[k + 1]]
+
+
+class CuboConteos:
+    """
+    Cubo de conteos sobre dimensiones categóricas: una celda por combinación
+    de valores presente, con su número de políticos y de posts. El recuento
+    marginal de una dimensión con restricciones en las demás es una máscara
+    y un bincount sobre las celdas (como mucho tantas como políticos y
+    normalmente muchas menos), sin volver a filtrar la tabla por opción.
+    """
+
+    def __init__(self, df: pd.DataFrame, dimensiones: Sequence[str], posts: np.ndarray):
+        self.dimensiones = list(dimensiones)
+        self.valores: Dict[str, List[Hashable]] = {}
+        self.codigos: Dict[str, Dict[Hashable, int]] = {}
+        codigos = []
+        for dim in self.dimensiones:
+            codigos_dim, valores = pd.factorize(df[dim])
+            self.valores[dim] = list(valores)
+            self.codigos[dim] = {valor: k for k, valor in enumerate(self.valores[dim])}
+            codigos.append(codigos_dim)
+        celdas, inversa = np.unique(np.column_stack(codigos), axis=0, return_inverse=True)
+        inversa = inversa.ravel()
+        # Los nulos (código -1) pasan al último código, que nunca se admite
+        self.celdas = {
+            dim: np.where(celdas[:, i] >= 0, celdas[:, i], len(self.valores[dim]))
+            for i, dim in enumerate(self.dimensiones)
+        }
+        self.politicos = np.bincount(inversa, minlength=len(celdas))
+        self.posts = np.bincount(inversa, weights=posts, minlength=len(celdas)).astype(np.int64)
+
+    def conteos(self, dimension: str, restricciones: Dict[str, Sequence[Hashable]]) -> Dict[Hashable, Tuple[int, int]]:
+        """
+        Políticos y posts por valor de `dimension` entre los que cumplen
+        `restricciones` (dimensión -> valores admitidos).
+        """
+        mascara = np.ones(len(self.politicos), dtype=bool)
+        for dim, valores in restricciones.items():
+            admitidos = np.zeros(len(self.valores[dim]) + 1, dtype=bool)
+            admitidos[[self.codigos[dim][v] for v in valores if v in self.codigos[dim]]] = True
+            mascara &= admitidos[self.celdas[dim]]
+        n = len(self.valores[dimension]) + 1
+        codigos = self.celdas[dimension][mascara]
+        politicos = np.bincount(codigos, weights=self.politicos[mascara], minlength=n)[:-1]
+        posts = np.bincount(codigos, weights=self.posts[mascara], minlength=n)[:-1]
+        valores = self.valores[dimension]
+        return {valores[k]: (int(politicos[k]), int(posts[k])) for k in np.flatnonzero(politicos)}
+
+
+class IndiceFiltros:
+    """
+    Índice de bits de un DataFrame. Un bitset es un array uint8 empaquetado
+    con un bit por fila (posicional) del DataFrame indexado.
+    """
+
+    def __init__(self, df: pd.DataFrame, columnas: Sequence[str]):
+        self.n = len(df)
+        self.bitsets: Dict[str, Dict[Hashable, np.ndarray]] = {}
+        self.ordenados: Dict[str, Tuple[pd.Series, np.ndarray]] = {}
+        self.pertenencia: Dict[str, MatrizPertenencia] = {}
+        self.posts = (
+            df[COLUMNA_POSTS_CUBO].fillna(0).to_numpy(dtype=np.int64)
+            if COLUMNA_POSTS_CUBO in df.columns else np.zeros(self.n, dtype=np.int64)
+        )
+
+        for col in columnas:
+            if col in COLUMNAS_RANGO:
+                valores = df[col].reset_index(drop=True).dropna()
+                orden = np.argsort(valores.to_numpy(), kind="stable")
+                self.ordenados[col] = (valores.iloc[orden].reset_index(drop=True), valores.index.to_numpy()[orden])
+            elif col in COLUMNAS_MULTIVALOR:
+                matriz = MatrizPertenencia(df[col], COLUMNAS_MULTIVALOR[col])
+                self.pertenencia[col] = matriz
+                self.bitsets[col] = {}
+                for valor in matriz.valores:
+                    mascara = np.zeros(self.n, dtype=bool)
+                    mascara[matriz.filas(valor)] = True
+                    self.bitsets[col][valor] = _empaquetar(mascara)
+            else:
+                codigos, valores = pd.factorize(df[col], sort=False)
+                self.bitsets[col] = {
+                    valor: _empaquetar(codigos == i) for i, valor in enumerate(valores)
+                }
+
+        # El cubo solo es exacto si ninguna fila tiene nulos en las columnas de
+        # rango (los sliders descartan esas filas aunque abarquen todo el rango)
+        dimensiones = [col for col in DIMENSIONES_CUBO if col in self.bitsets]
+        sin_nulos_rango = not df[[col for col in self.ordenados]].isna().any().any()
+        self.cubo = CuboConteos(df, dimensiones, self.posts) if dimensiones and sin_nulos_rango else None
+
+    def todos(self) -> np.ndarray:
+        return _empaquetar(np.ones(self.n, dtype=bool))
+
+    def conteos(self, col: str, seleccion: np.ndarray) -> Dict[Hashable, Tuple[int, int]]:
+        """
+        Políticos y posts por valor de `col` dentro de la selección, contando
+        bits (alternativa al cubo cuando hay filtros que este no representa).
+        """
+        seleccionadas = np.unpackbits(seleccion, count=self.n).astype(bool)
+        conteos = {}
+        for valor, bits in self.bitsets[col].items():
+            filas = np.unpackbits(bits, count=self.n).astype(bool) & seleccionadas
+            if filas.any():
+                conteos[valor] = (int(filas.sum()), int(self.posts[filas].sum()))
+        return conteos
+
+    def filas(self, seleccion: np.ndarray) -> np.ndarray:
+        """
+        Posiciones de las filas seleccionadas, en orden.
+        """
+        return np.flatnonzero(np.unpackbits(seleccion, count=self.n))
+
+    def valores(self, col: str, seleccion: np.ndarray) -> List[Hashable]:
+        """
+        Valores de `col` presentes en alguna fila de la selección.
+        """
+        return [v for v, bits in self.bitsets[col].items() if np.any(bits & seleccion)]
+
+    def por_valores(self, col: str, valores: Sequence[Hashable], todos: bool = False) -> np.ndarray:
+        """
+        Filas cuyo valor de `col` está entre `valores` (OR de sus bitsets). En
+        las columnas multivalor, con `todos` se exige que la fila contenga
+        todos los valores (AND) en lugar de alguno.
+        """
+        vacio = np.zeros_like(self.todos())
+        bitsets = [self.bitsets[col].get(valor, vacio) for valor in valores]
+        if not bitsets:
+            return vacio
+        return np.bitwise_and.reduce(bitsets) if todos else np.bitwise_or.reduce(bitsets)
+
+    def extremos(self, col: str, seleccion: np.ndarray):
+        """
+        Mínimo y máximo de `col` en la selección (None si no hay valores).
+        """
+        ordenados, posiciones = self.ordenados[col]
+        presentes = np.flatnonzero(np.unpackbits(seleccion, count=self.n)[posiciones])
+        if len(presentes) == 0:
+            return None
+        return ordenados.iloc[presentes[0]], ordenados.iloc[presentes[-1]]
+
+    def por_rango(self, col: str, minimo, maximo) -> np.ndarray:
+        """
+        Filas con minimo <= col <= maximo, por búsqueda binaria en los valores ordenados.
+        """
+        ordenados, posiciones = self.ordenados[col]
+        inicio = ordenados.searchsorted(minimo, side="left")
+        fin = ordenados.searchsorted(maximo, side="right")
+        mascara = np.zeros(self.n, dtype=bool)
+        mascara[posiciones[inicio:fin]] = True
+        return _empaquetar(mascara)
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def construir_indice(df: pd.DataFrame, columnas: Tuple[str, ...]) -> IndiceFiltros:
+    return IndiceFiltros(df, columnas)
+
+
+def firma_filtros(version: str, filtros: Dict[str, tuple]) -> tuple:
+    """
+    Firma canónica de los filtros activos de una versión de los datos. Cada
+    filtro es ("rango", mínimo, máximo) o ("alguna" | "todas", valores). Las
+    columnas y los valores se ordenan, así que el orden en que se eligieron no
+    cambia la firma (la selección final es el AND de todos los filtros).
+    """
+    canonicos = []
+    for col in sorted(filtros):
+        tipo, *argumentos = filtros[col]
+        if tipo == "rango":
+            canonicos.append((col, tipo, *argumentos))
+        else:
+            canonicos.append((col, tipo, tuple(sorted(set(argumentos[0]), key=str))))
+    return (version, tuple(canonicos))
+
+
+def _tamaño(objeto) -> int:
+    if isinstance(objeto, pd.DataFrame):
+        return int(objeto.memory_usage(deep=True).sum())
+    if isinstance(objeto, pd.Series):
+        return int(objeto.memory_usage(deep=True))
+    if isinstance(objeto, np.ndarray):
+        return int(objeto.nbytes)
+    if isinstance(objeto, (tuple, list)):
+        return sum(_tamaño(o) for o in objeto)
+    if isinstance(objeto, dict):
+        return sum(_tamaño(o) for o in objeto.values())
+    if hasattr(objeto, "__dict__"):
+        return _tamaño(vars(objeto))
+    return sys.getsizeof(objeto)
+
+
+class CacheResultados:
+    """
+    Caché LRU, compartida por todas las sesiones del proceso, de los
+    resultados de cada firma de filtros: las filas seleccionadas, los
+    ID_Político y los marcos derivados que las vistas le van añadiendo.
+    Se expulsan las entradas menos usadas al superar `max_entradas` o
+    `max_bytes`. Los marcos guardados se comparten: no deben modificarse.
+    """
+
+    def __init__(self, max_entradas: int = MAX_ENTRADAS_CACHE, max_bytes: int = MAX_BYTES_CACHE):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self.entradas: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self.tamaños: Dict[tuple, int] = {}
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsiones = 0
+        self._cerrojo = threading.RLock()
+
+    def obtener(self, firma: tuple, nombre: str, calcular: Callable[[], Any]) -> Any:
+        """
+        Devuelve el resultado `nombre` de la firma, calculándolo y guardándolo
+        si no estaba.
+        """
+        with self._cerrojo:
+            entrada = self.entradas.get(firma)
+            if entrada is not None and nombre in entrada:
+                self.entradas.move_to_end(firma)
+                self.aciertos += 1
+                return entrada[nombre]
+            self.fallos += 1
+
+        valor = calcular()
+        with self._cerrojo:
+            entrada = self.entradas.setdefault(firma, {})
+            if nombre not in entrada:
+                entrada[nombre] = valor
+                self.tamaños[firma] = self.tamaños.get(firma, 0) + _tamaño(valor)
+            self.entradas.move_to_end(firma)
+            self._expulsar(conservar=firma)
+            return entrada[nombre]
+
+    def _expulsar(self, conservar: tuple) -> None:
+        while len(self.entradas) > 1 and (
+            len(self.entradas) > self.max_entradas or sum(self.tamaños.values()) > self.max_bytes
+        ):
+            firma = next(iter(self.entradas))
+            if firma == conservar:
+                break
+            del self.entradas[firma]
+            del self.tamaños[firma]
+            self.expulsiones += 1
+
+    def estadisticas(self) -> Dict[str, int]:
+        with self._cerrojo:
+            return {
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "expulsiones": self.expulsiones,
+                "entradas": len(self.entradas),
+                "bytes": sum(self.tamaños.values()),
+            }
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def cache_resultados() -> CacheResultados:
+    return CacheResultados()
+
+
+class IndicePermutacion:
+    """
+    Índice de permutación por clave: las posiciones de las filas ordenadas por
+    clave (argsort estable) y un offset por clave, de modo que las filas de la
+    clave k son orden[offsets[k]:offsets[k + 1]]. Las filas de una clave no
+    son un tramo contiguo de la tabla (el almacén está particionado por mes),
+    así que seleccionar un conjunto de claves es reunir sus tramos de la
+    permutación y ordenar esas posiciones: coste proporcional a las filas
+    seleccionadas, sin recorrer la tabla.
+    """
+
+    def __init__(self, claves: pd.Series):
+        if isinstance(claves.dtype, pd.CategoricalDtype):
+            codigos = claves.cat.codes.to_numpy().astype(np.int64)
+            self.valores = pd.Index(claves.cat.categories)
+        else:
+            codigos, valores = pd.factorize(claves)
+            self.valores = pd.Index(valores)
+        validos = np.flatnonzero(codigos >= 0)
+        self.orden = validos[np.argsort(codigos[validos], kind="stable")]
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(codigos[validos], minlength=len(self.valores)))))
+
+    def filas(self, valores) -> np.ndarray:
+        """
+        Posiciones de las filas cuya clave está en `valores`, reunidas de la
+        permutación y devueltas en el orden de la tabla.
+        """
+        codigos = self.valores.get_indexer(pd.unique(np.asarray(valores)))
+        codigos = codigos[codigos >= 0]
+        inicios = self.offsets[codigos]
+        longitudes = self.offsets[codigos + 1] - inicios
+        total = int(longitudes.sum())
+        if total == 0:
+            return np.empty(0, dtype=np.int64)
+        desplazamiento = np.repeat(inicios - np.cumsum(longitudes) + longitudes, longitudes)
+        return np.sort(self.orden[desplazamiento + np.arange(total)])
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _indice_permutacion_version(version: str, hoja: str, clave: str) -> Tuple[IndicePermutacion, pd.Series]:
+    claves = cargar_columnas(hoja, [clave])[clave]
+    return IndicePermutacion(claves), claves
+
+
+def indice_permutacion(hoja: str, clave: str) -> Tuple[IndicePermutacion, pd.Series]:
+    """
+    Índice de permutación de `hoja` por `clave` y la columna de claves
+    completa, construidos una vez por versión de los datos.
+    """
+    return _indice_permutacion_version(obtener_version_datos(), hoja, clave)
+
+
+def posts_y_comentarios(
+    df_filtrado: pd.DataFrame,
+    df_posts: pd.DataFrame,
+    df_comentarios: Optional[pd.DataFrame] = None
+) -> Tuple[pd.DataFrame, Optional[pd.DataFrame]]:
+    """
+    Posts de los políticos de df_filtrado y comentarios de esos posts. df_posts
+    y df_comentarios son proyecciones de las hojas completas (cargar_columnas,
+    con cualquier subconjunto de columnas); las filas se toman por posición a
+    través de los índices de permutación ID_Político -> Posts y Enlace_Post ->
+    Comentarios, conservando el orden y las etiquetas originales.
+    """
+    indice_posts, _ = indice_permutacion("Posts", "ID_Político")
+    filas_posts = indice_posts.filas(df_filtrado["ID_Político"])
+    posts = df_posts.iloc[filas_posts]
+    if df_comentarios is None:
+        return posts, None
+
+    indice_comentarios, _ = indice_permutacion("Comentarios", "Enlace_Post")
+    _, enlaces = indice_permutacion("Posts", "Enlace_Post")
+    return posts, df_comentarios.iloc[indice_comentarios.filas(enlaces.iloc[filas_posts])]
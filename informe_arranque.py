@@ -0,0 +1,91 @@
+"""
+Informe del tiempo de importación en el arranque de la aplicación: ejecuta un
+intérprete nuevo con `-X importtime`, importa lo que importa app.py antes de
+mostrar ninguna vista y, aparte, lo que añade cada vista en su primer uso.
+Compara el total del arranque con un presupuesto.
+
+Uso: python informe_arranque.py [--presupuesto 1500] [--top 15]
+"""
+import argparse
+import re
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# Módulos que importa app.py (y lo que importan estos al cargarse)
+MODULOS_ARRANQUE: List[str] = ["streamlit", "data_loader", "controllers", "display"]
+
+# Módulos que cada vista importa la primera vez que se muestra
+MODULOS_VISTA: Dict[str, List[str]] = {
+    "Análisis básico": ["visualizaciones_basicas"],
+    "Análisis en profundidad": [
+        "analisis_en_profundidad.popularidad_actividad",
+        "analisis_en_profundidad.interaccion_impacto",
+        "analisis_en_profundidad.tono_discurso",
+        "analisis_en_profundidad.contenido_tokens",
+    ],
+}
+
+# Módulos que no deben cargarse nunca al arrancar
+PROHIBIDOS_ARRANQUE: List[str] = ["geopandas", "shapely", "plotly.express"]
+
+PRESUPUESTO_MS = 1500
+
+_PATRON = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def medir_importacion(modulos: List[str], previos: List[str] = ()) -> List[Tuple[str, int, int, int]]:
+    """
+    Importa `modulos` en un intérprete nuevo con -X importtime (tras importar
+    `previos`, que no se cuentan) y devuelve (módulo, propio µs, acumulado µs,
+    profundidad) de cada módulo cargado.
+    """
+    codigo = "; ".join([f"import {m}" for m in previos] + ["import sys", "sys.stderr.write('--medir--\\n')"]
+                       + [f"import {m}" for m in modulos])
+    proceso = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", codigo],
+        capture_output=True, text=True, check=True
+    )
+    lineas = proceso.stderr.split("--medir--\n", 1)[-1].splitlines()
+    registros = []
+    for linea in lineas:
+        coincidencia = _PATRON.match(linea)
+        if coincidencia:
+            propio, acumulado, sangria, modulo = coincidencia.groups()
+            registros.append((modulo, int(propio), int(acumulado), len(sangria) // 2))
+    return registros
+
+
+def total_ms(registros: List[Tuple[str, int, int, int]]) -> float:
+    return sum(acumulado for _, _, acumulado, profundidad in registros if profundidad == 0) / 1000
+
+
+def informe(registros: List[Tuple[str, int, int, int]], top: int) -> str:
+    lineas = [f"  {'Módulo':<60} {'Acumulado (ms)':>15}"]
+    for modulo, _, acumulado, _ in sorted(registros, key=lambda r: -r[2])[:top]:
+        lineas.append(f"  {modulo:<60} {acumulado / 1000:>15.1f}")
+    return "\n".join(lineas)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tiempo de importación en el arranque")
+    parser.add_argument("--presupuesto", type=float, default=PRESUPUESTO_MS, help="Límite del arranque en ms")
+    parser.add_argument("--top", type=int, default=15, help="Módulos más lentos a mostrar")
+    args = parser.parse_args()
+
+    arranque = medir_importacion(MODULOS_ARRANQUE)
+    total = total_ms(arranque)
+    print(f"Arranque: {total:.0f} ms (presupuesto {args.presupuesto:.0f} ms)")
+    print(informe(arranque, args.top))
+
+    cargados = {modulo for modulo, *_ in arranque}
+    prohibidos = [m for m in PROHIBIDOS_ARRANQUE if m in cargados]
+    if prohibidos:
+        print(f"Módulos que no deberían cargarse al arrancar: {', '.join(prohibidos)}")
+
+    for vista, modulos in MODULOS_VISTA.items():
+        registros = medir_importacion(modulos, previos=MODULOS_ARRANQUE)
+        print(f"\nPrimer uso de '{vista}': +{total_ms(registros):.0f} ms")
+        print(informe(registros, min(args.top, 5)))
+
+    sys.exit(1 if total > args.presupuesto or prohibidos else 0)
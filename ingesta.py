@@ -0,0 +1,461 @@
+"""
+Ingesta de datos: parseo y codificación de las columnas de tokens y carga en
+flujo (por lotes) de Posts y Comentarios desde CSV/JSONL al almacén columnar.
+
+Uso en flujo:
+    python ingesta.py --posts posts.csv --comentarios comentarios.jsonl [--metadata metadata.csv]
+
+Para añadir datos nuevos a un almacén existente:
+    python ingesta.py --anexar [--posts nuevos_posts.csv] [--comentarios nuevos_comentarios.jsonl]
+
+Con --procesos N el parseo de tokens se reparte entre N procesos (contexto
+"spawn"); dentro de la aplicación de Streamlit siempre se hace en un solo proceso.
+"""
+import argparse
+import ast
+import hashlib
+import multiprocessing
+import os
+import re
+import shutil
+from concurrent.futures import Executor, ProcessPoolExecutor
+from itertools import chain
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from typing import Dict, Iterator, List, Optional, Tuple
+from almacen import (
+    COLUMNA_PARTICION, HOJAS, HOJAS_PARTICIONADAS, VERSION_SNAPSHOT, escribir_manifiesto,
+    escribir_particionado, escribir_tabla, escribir_vocabulario, leer_manifiesto, leer_tabla,
+    leer_vocabulario, mes_particion, normalizar_para_arrow, ruta_snapshot
+)
+
+COLUMNAS_TOKENS: Dict[str, List[str]] = {
+    "Posts": ["Corpus_Tokens", "Entidades"],
+    "Comentarios": [
+        "Corpus_Tokens_Comentarios", "Entidades_Comentarios",
+        "Corpus_Tokens_Respuestas", "Entidades_Respuestas"
+    ],
+}
+
+TAMAÑO_TROZO = 50_000
+# Filas por tarea al repartir el parseo de tokens entre procesos
+TAMAÑO_TROZO_PARSEO = 10_000
+
+COLUMNAS_FECHA = ["Fecha_Publicación"]
+COLUMNAS_CONTADOR = ["Likes", "Retweets", "Comentarios_Totales"]
+COLUMNAS_TONO = ["Tono", "Tono_Respuesta"]
+COLUMNAS_TEXTO = ["Enlace_Post", "Tema"]
+
+# Agregados por delta: columnas de posts por tono y claves de los posts por tema
+PREFIJO_TONO = "Tono_"
+CLAVES_TEMA = ["ID_Político", "Tema", "Tono"]
+
+_PATRON_ELEMENTO = re.compile(r"'([^'\\]*)'|\"([^\"\\]*)\"")
+
+
+class ColumnaTokens:
+    """
+    Columna de listas de tokens codificada como enteros: ids int32 sobre un
+    vocabulario global y offsets por fila (los tokens de la fila i son
+    ids[offsets[i]:offsets[i + 1]]).
+    """
+
+    def __init__(self, ids: np.ndarray, offsets: np.ndarray, vocabulario: np.ndarray):
+        self.ids = ids
+        self.offsets = offsets
+        self.vocabulario = vocabulario
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def ids_de_filas(self, filas: np.ndarray) -> np.ndarray:
+        """
+        Devuelve concatenados los ids de tokens de las filas indicadas (posiciones).
+        """
+        filas = np.asarray(filas, dtype=np.int64)
+        inicios = self.offsets[filas]
+        longitudes = self.offsets[filas + 1] - inicios
+        total = int(longitudes.sum())
+        if total == 0:
+            return np.empty(0, dtype=self.ids.dtype)
+        desplazamiento = np.repeat(inicios - np.cumsum(longitudes) + longitudes, longitudes)
+        return self.ids[desplazamiento + np.arange(total)]
+
+
+def parsear_lista(valor) -> List[str]:
+    """
+    Convierte una lista serializada ("['a', 'b']") en lista de Python sin pasar
+    por ast salvo que el texto contenga escapes. Nulos y valores no válidos
+    se tratan como lista vacía.
+    """
+    if isinstance(valor, list):
+        return valor
+    if not isinstance(valor, str):
+        return []
+    if "\\" in valor:
+        try:
+            resultado = ast.literal_eval(valor)
+        except (ValueError, SyntaxError):
+            return []
+        return list(resultado) if isinstance(resultado, (list, tuple)) else []
+    return [simple or doble for simple, doble in _PATRON_ELEMENTO.findall(valor)]
+
+
+def _parsear_trozo(valores: list) -> List[List[str]]:
+    return [parsear_lista(v) for v in valores]
+
+
+def parsear_columna(
+    serie: pd.Series,
+    tamaño_trozo: int = TAMAÑO_TROZO_PARSEO,
+    ejecutor: Optional[Executor] = None
+) -> List[List[str]]:
+    """
+    Parsea una columna de listas serializadas en el proceso actual o, si se
+    pasa un `ejecutor` (solo desde la línea de comandos, ver
+    ejecutor_procesos), repartiendo los trozos entre sus procesos.
+    """
+    valores = serie.tolist()
+    if ejecutor is None or len(valores) <= tamaño_trozo:
+        return _parsear_trozo(valores)
+    trozos = [valores[i:i + tamaño_trozo] for i in range(0, len(valores), tamaño_trozo)]
+    return list(chain.from_iterable(ejecutor.map(_parsear_trozo, trozos)))
+
+
+def ejecutor_procesos(procesos: int) -> ProcessPoolExecutor:
+    """
+    Pool de procesos para parsear tokens en la ingesta por línea de comandos.
+    Usa el contexto "spawn": los procesos hijos no heredan por fork el estado
+    (hilos, cerrojos) del proceso padre.
+    """
+    return ProcessPoolExecutor(procesos, mp_context=multiprocessing.get_context("spawn"))
+
+
+def codificar_tokens(
+    columnas: Dict[str, pd.Series],
+    ejecutor: Optional[Executor] = None
+) -> Tuple[np.ndarray, Dict[str, Tuple[np.ndarray, np.ndarray]]]:
+    """
+    Parsea las columnas de tokens y las codifica contra un vocabulario común.
+    Devuelve el vocabulario y, por columna, el par (ids int32, offsets int64).
+    """
+    listas = {col: parsear_columna(serie, ejecutor=ejecutor) for col, serie in columnas.items()}
+    planos = np.fromiter(
+        chain.from_iterable(chain.from_iterable(listas.values())),
+        dtype=object,
+        count=sum(len(l) for filas in listas.values() for l in filas)
+    )
+    codigos, vocabulario = pd.factorize(planos)
+    codigos = codigos.astype(np.int32)
+
+    codificadas = {}
+    inicio = 0
+    for col, filas in listas.items():
+        longitudes = np.fromiter((len(l) for l in filas), dtype=np.int64, count=len(filas))
+        offsets = np.concatenate(([0], np.cumsum(longitudes)))
+        codificadas[col] = (codigos[inicio:inicio + offsets[-1]], offsets)
+        inicio += offsets[-1]
+    return np.asarray(vocabulario, dtype=object), codificadas
+
+
+def a_lista_arrow(ids: np.ndarray, offsets: np.ndarray) -> pa.ListArray:
+    """
+    Empaqueta ids y offsets como columna Arrow list<int32> sin nulos.
+    """
+    return pa.ListArray.from_arrays(pa.array(offsets.astype(np.int32)), pa.array(ids, type=pa.int32()))
+
+
+def desde_lista_arrow(columna: pa.ChunkedArray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Recupera (ids, offsets) de una columna list<int32>. Con una tabla
+    mapeada en memoria los ids se leen sin copia.
+    """
+    lista = columna.combine_chunks()
+    offsets = lista.offsets.to_numpy()
+    ids = lista.values.to_numpy()[offsets[0]:offsets[-1]]
+    return ids, (offsets - offsets[0]).astype(np.int64)
+
+
+def leer_lotes(ruta: str, tamaño_lote: int = TAMAÑO_TROZO) -> Iterator[pd.DataFrame]:
+    """
+    Generador de lotes de un CSV o JSONL (una fila JSON por línea) sin
+    cargar el archivo completo.
+    """
+    if ruta.endswith((".jsonl", ".ndjson", ".json")):
+        lector = pd.read_json(ruta, lines=True, chunksize=tamaño_lote)
+    else:
+        lector = pd.read_csv(ruta, chunksize=tamaño_lote)
+    with lector:
+        yield from lector
+
+
+def normalizar_lote(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Homogeneiza los tipos de un lote para que todos compartan esquema:
+    fechas, contadores enteros, tonos capitalizados y claves como texto.
+    """
+    df = df.copy()
+    for col in df.columns.intersection(COLUMNAS_FECHA):
+        df[col] = pd.to_datetime(df[col], errors="coerce")
+    for col in df.columns.intersection(COLUMNAS_CONTADOR):
+        df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int64")
+    for col in df.columns.intersection(COLUMNAS_TONO):
+        df[col] = df[col].astype("string").str.strip().str.capitalize()
+    for col in df.columns.intersection(COLUMNAS_TEXTO):
+        df[col] = df[col].astype("string")
+    return df
+
+
+def codificar_lote(
+    serie: pd.Series,
+    vocabulario: Dict[str, int],
+    ejecutor: Optional[Executor] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Parsea y codifica una columna de tokens de un lote, ampliando el
+    vocabulario (término -> id) con los términos nuevos.
+    """
+    listas = parsear_columna(serie, ejecutor=ejecutor)
+    longitudes = np.fromiter((len(l) for l in listas), dtype=np.int64, count=len(listas))
+    ids = np.fromiter(
+        (vocabulario.setdefault(t, len(vocabulario)) for l in listas for t in l),
+        dtype=np.int32, count=int(longitudes.sum())
+    )
+    return ids, np.concatenate(([0], np.cumsum(longitudes)))
+
+
+def lote_a_arrow(
+    df: pd.DataFrame,
+    hoja: str,
+    vocabulario: Dict[str, int],
+    ejecutor: Optional[Executor] = None
+) -> pa.Table:
+    columnas_tokens = [c for c in COLUMNAS_TOKENS.get(hoja, []) if c in df.columns]
+    tabla = pa.Table.from_pandas(normalizar_para_arrow(df.drop(columns=columnas_tokens)), preserve_index=False)
+    for col in columnas_tokens:
+        tabla = tabla.append_column(col, a_lista_arrow(*codificar_lote(df[col], vocabulario, ejecutor)))
+    return tabla
+
+
+class AgregadosIncrementales:
+    """
+    Agregados de Posts que se mantienen sumando el delta de cada lote: por
+    político, sumas de interacción, posts extraídos y posts por tono
+    (columnas PREFIJO_TONO + tono); y posts por (político, tema, tono). De
+    ellos salen la Interacción de metricas.py y las matrices de tono, sin
+    volver a recorrer la hoja Posts.
+    """
+
+    def __init__(self, tabla: Optional[pd.DataFrame] = None, temas: Optional[pd.Series] = None):
+        self.tabla = tabla if tabla is not None else pd.DataFrame(index=pd.Index([], name="ID_Político"))
+        self.temas = temas
+
+    @classmethod
+    def desde_almacen(cls) -> "AgregadosIncrementales":
+        """
+        Recupera los agregados guardados en el almacén (la interacción se
+        recalcula al pedir el resultado, así que no se lee).
+        """
+        tabla = leer_tabla("agregados_politico").to_pandas().set_index("ID_Político")
+        temas = leer_tabla("agregados_tema").to_pandas().set_index(CLAVES_TEMA)["Posts"]
+        return cls(tabla.drop(columns=["Interacción"], errors="ignore"), temas if len(temas) else None)
+
+    def delta_posts(self, lote: pd.DataFrame) -> pd.DataFrame:
+        sumas = [col for col in lote.columns if col in COLUMNAS_CONTADOR]
+        delta = lote.groupby("ID_Político", observed=True).agg(
+            **{col: (col, "sum") for col in sumas},
+            Posts_extraidos=("ID_Político", "size")
+        )
+        if "Tono" in lote.columns:
+            tonos = lote.groupby(["ID_Político", "Tono"], observed=True).size().unstack(fill_value=0)
+            delta = delta.join(tonos.add_prefix(PREFIJO_TONO))
+        return delta.fillna(0)
+
+    def delta_temas(self, lote: pd.DataFrame) -> pd.Series:
+        return lote[CLAVES_TEMA].astype(object).groupby(CLAVES_TEMA).size()
+
+    def actualizar_posts(self, lote: pd.DataFrame) -> None:
+        self.tabla = self.tabla.add(self.delta_posts(lote), fill_value=0)
+        if set(CLAVES_TEMA) <= set(lote.columns):
+            delta = self.delta_temas(lote)
+            self.temas = delta if self.temas is None else self.temas.add(delta, fill_value=0)
+
+    def resultado(self) -> pd.DataFrame:
+        """
+        Agregados actuales con la interacción media por post recalculada.
+        """
+        tabla = self.tabla.fillna(0).astype("int64")
+        if "Posts_extraidos" in tabla.columns:
+            sumas = tabla[[c for c in COLUMNAS_CONTADOR if c in tabla.columns]].sum(axis=1)
+            tabla["Interacción"] = (sumas / tabla["Posts_extraidos"].where(tabla["Posts_extraidos"] > 0)).round(0)
+        return tabla.reset_index()
+
+    def resultado_temas(self) -> pd.DataFrame:
+        """
+        Posts por (político, tema, tono) en formato largo, una fila por
+        combinación con algún post.
+        """
+        if self.temas is None:
+            return pd.DataFrame({col: pd.Series(dtype=object) for col in CLAVES_TEMA}).assign(Posts=0)
+        return self.temas.astype("int64").rename("Posts").reset_index()
+
+    def guardar(self) -> None:
+        tabla = self.resultado()
+        tabla["ID_Político"] = tabla["ID_Político"].astype(object)
+        escribir_tabla(pa.Table.from_pandas(normalizar_para_arrow(tabla), preserve_index=False), "agregados_politico")
+        temas = self.resultado_temas()
+        escribir_tabla(pa.Table.from_pandas(normalizar_para_arrow(temas), preserve_index=False), "agregados_tema")
+
+
+def _anexar_hoja(
+    lote: pd.DataFrame,
+    hoja: str,
+    vocabulario: Dict[str, int],
+    agregados: AgregadosIncrementales,
+    ejecutor: Optional[Executor] = None
+) -> int:
+    """
+    Escribe un lote normalizado en las particiones mensuales de la hoja y
+    acumula su delta en los agregados.
+    """
+    tabla = lote_a_arrow(lote, hoja, vocabulario, ejecutor)
+    if hoja == "Posts":
+        agregados.actualizar_posts(lote)
+    escribir_particionado(tabla, hoja, mes_particion(lote[COLUMNA_PARTICION]))
+    return tabla.num_rows
+
+
+def _leer_metadata(ruta: str) -> pd.DataFrame:
+    if ruta.endswith((".xlsx", ".xls")):
+        return pd.read_excel(ruta, sheet_name="Metadata")
+    if ruta.endswith((".jsonl", ".ndjson", ".json")):
+        return pd.read_json(ruta, lines=True)
+    return pd.read_csv(ruta)
+
+
+def ingerir_en_flujo(
+    ruta_posts: str,
+    ruta_comentarios: str,
+    ruta_metadata: str,
+    tamaño_lote: int = TAMAÑO_TROZO,
+    ejecutor: Optional[Executor] = None
+) -> Dict[str, int]:
+    """
+    Carga Posts y Comentarios lote a lote en el almacén columnar: cada lote se
+    normaliza, se codifican sus tokens, se reparte en sus particiones mensuales
+    y se acumulan sus agregados. La memoria máxima depende del tamaño de lote
+    (más el vocabulario y los agregados), no del tamaño de los datos.
+    Devuelve las filas cargadas de cada hoja.
+    """
+    # Mientras se reescriben las hojas el almacén no es coherente: sin manifiesto
+    # la aplicación no lo usará hasta que termine la ingesta
+    if os.path.exists(ruta_snapshot("manifest.json")):
+        os.remove(ruta_snapshot("manifest.json"))
+    for hoja in HOJAS_PARTICIONADAS:
+        shutil.rmtree(ruta_snapshot(hoja), ignore_errors=True)
+
+    vocabulario: Dict[str, int] = {}
+    agregados = AgregadosIncrementales()
+    huella = hashlib.sha256()
+    filas = {}
+
+    for hoja, ruta in (("Posts", ruta_posts), ("Comentarios", ruta_comentarios)):
+        filas[hoja] = 0
+        for lote in leer_lotes(ruta, tamaño_lote):
+            filas[hoja] += _anexar_hoja(normalizar_lote(lote), hoja, vocabulario, agregados, ejecutor)
+        info = os.stat(ruta)
+        huella.update(f"{hoja}:{os.path.abspath(ruta)}:{info.st_size}:{info.st_mtime_ns}".encode())
+
+    metadata = _leer_metadata(ruta_metadata)
+    escribir_tabla(pa.Table.from_pandas(normalizar_para_arrow(metadata), preserve_index=False), "Metadata")
+    escribir_vocabulario(vocabulario)
+    agregados.guardar()
+    huella.update(pd.util.hash_pandas_object(metadata.astype(str)).values.tobytes())
+
+    manifiesto = {
+        "formato": VERSION_SNAPSHOT,
+        "origen": "flujo",
+        "sha256": huella.hexdigest(),
+        "fuentes": {"Posts": ruta_posts, "Comentarios": ruta_comentarios, "Metadata": ruta_metadata},
+        "hojas": list(HOJAS),
+    }
+    escribir_manifiesto(manifiesto)
+    return filas
+
+
+def anexar(
+    posts: Optional[pd.DataFrame] = None,
+    comentarios: Optional[pd.DataFrame] = None,
+    ejecutor: Optional[Executor] = None
+) -> Dict[str, int]:
+    """
+    Añade un lote de posts y/o comentarios nuevos a un almacén ya creado (desde
+    el Excel o por ingesta en flujo) sin recalcular nada de lo existente: las
+    filas van a partes nuevas de sus particiones mensuales, el vocabulario solo
+    crece y los agregados se actualizan con el delta del lote. La versión del
+    manifiesto ("sha256") cambia, de modo que la aplicación recarga los datos;
+    el hash del Excel de origen ("sha256_origen") se conserva.
+
+    Los datos anexados viven solo en el almacén: si el contenido del Excel de
+    origen cambia, el snapshot se regenera a partir de él y se descartan.
+    Devuelve las filas anexadas de cada hoja (vacío si no había ninguna).
+    """
+    manifiesto = leer_manifiesto()
+    if manifiesto.get("formato") != VERSION_SNAPSHOT:
+        raise FileNotFoundError(f"No hay un almacén vigente en {ruta_snapshot('')}")
+
+    vocabulario = {termino: i for i, termino in enumerate(leer_vocabulario())}
+    n_previo = len(vocabulario)
+    agregados = AgregadosIncrementales.desde_almacen()
+    huella = hashlib.sha256(manifiesto["sha256"].encode())
+    filas = {}
+
+    for hoja, lote in (("Posts", posts), ("Comentarios", comentarios)):
+        if lote is None or lote.empty:
+            continue
+        lote = normalizar_lote(lote)
+        filas[hoja] = _anexar_hoja(lote, hoja, vocabulario, agregados, ejecutor)
+        huella.update(hoja.encode())
+        huella.update(pd.util.hash_pandas_object(lote.astype(str), index=False).values.tobytes())
+
+    if not filas:
+        return filas
+    if len(vocabulario) > n_previo:
+        escribir_vocabulario(vocabulario)
+    agregados.guardar()
+
+    manifiesto.update(sha256=huella.hexdigest(), anexos=manifiesto.get("anexos", 0) + 1)
+    escribir_manifiesto(manifiesto)
+    return filas
+
+
+if __name__ == "__main__":
+    from data_loader import RUTA_DATOS
+
+    parser = argparse.ArgumentParser(description="Ingesta en flujo de Posts y Comentarios desde CSV/JSONL")
+    parser.add_argument("--posts")
+    parser.add_argument("--comentarios")
+    parser.add_argument("--metadata", default=RUTA_DATOS, help="CSV/JSONL o Excel con hoja Metadata")
+    parser.add_argument("--lote", type=int, default=TAMAÑO_TROZO, help="Filas por lote")
+    parser.add_argument("--anexar", action="store_true", help="Añadir los archivos al almacén existente")
+    parser.add_argument("--procesos", type=int, default=1, help="Procesos para parsear los tokens")
+    args = parser.parse_args()
+    if not (args.anexar or (args.posts and args.comentarios)):
+        parser.error("se necesitan --posts y --comentarios (o --anexar)")
+
+    ejecutor = ejecutor_procesos(args.procesos) if args.procesos > 1 else None
+    try:
+        if args.anexar:
+            filas = {}
+            for hoja, ruta in (("posts", args.posts), ("comentarios", args.comentarios)):
+                for lote in leer_lotes(ruta, args.lote) if ruta else []:
+                    for nombre, n in anexar(**{hoja: lote}, ejecutor=ejecutor).items():
+                        filas[nombre] = filas.get(nombre, 0) + n
+            print(", ".join(f"{hoja}: {n} filas anexadas" for hoja, n in filas.items()) or "No había filas que anexar")
+        else:
+            for hoja, n in ingerir_en_flujo(args.posts, args.comentarios, args.metadata, args.lote, ejecutor).items():
+                print(f"{hoja}: {n} filas")
+    finally:
+        if ejecutor is not None:
+            ejecutor.shutdown()
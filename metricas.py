@@ -0,0 +1,231 @@
+"""
+Métricas derivadas de cada político calculadas con expresiones vectorizadas
+a partir de las columnas brutas de Metadata y de los agregados de Posts por
+político que el almacén mantiene por delta (data_loader.cargar_agregados):
+
+- Tasa_Posts_Año y Tasa_Seguidores_Año: Posts y Seguidores entre los años en
+  X/Twitter (año de la fecha de referencia - "Comienzo en X/Twitter").
+- Interacción: media de Likes + Retweets + Comentarios_Totales por post.
+- Interacción_Relativa: Interacción por seguidor.
+
+Los resultados se guardan por versión de los datos y fecha de referencia.
+La interacción también puede calcularse para un periodo de publicación
+(InteraccionAcumulada): posts ordenados por político y fecha con sumas
+acumuladas, de modo que cada ventana son dos búsquedas binarias y una resta.
+
+Uso: python metricas.py [--fecha AAAA-MM-DD]  (compara con la hoja de cálculo)
+"""
+import argparse
+import datetime
+import numpy as np
+import pandas as pd
+import streamlit as st
+from typing import Dict, List, Optional, Tuple
+from almacen import convertir_fechas
+from config import FECHA_REFERENCIA_METRICAS
+from data_loader import cargar_agregados, cargar_columnas, obtener_version_datos
+
+COLUMNAS_DERIVADAS: List[str] = ["Tasa_Posts_Año", "Tasa_Seguidores_Año", "Interacción", "Interacción_Relativa"]
+COLUMNAS_BRUTAS: List[str] = ["ID_Político", "Seguidores", "Posts", "Comienzo en X/Twitter"]
+COLUMNAS_INTERACCION: List[str] = ["Likes", "Retweets", "Comentarios_Totales"]
+
+# Diferencia máxima admitida frente a los valores de la hoja de cálculo
+TOLERANCIAS: Dict[str, float] = {
+    "Tasa_Posts_Año": 1, "Tasa_Seguidores_Año": 1, "Interacción": 1, "Interacción_Relativa": 1e-6,
+}
+
+
+def _numerico(serie: pd.Series) -> np.ndarray:
+    return pd.to_numeric(serie, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+
+
+def _dividir(numerador: np.ndarray, denominador: np.ndarray) -> np.ndarray:
+    """
+    Cociente elemento a elemento; NaN donde el denominador no es positivo.
+    """
+    resultado = np.full(len(numerador), np.nan)
+    validos = denominador > 0
+    np.divide(numerador, denominador, out=resultado, where=validos)
+    return resultado
+
+
+def calcular_metricas(
+    metadata: pd.DataFrame,
+    agregados: pd.DataFrame,
+    fecha_referencia: str = FECHA_REFERENCIA_METRICAS
+) -> pd.DataFrame:
+    """
+    Métricas derivadas de cada fila de `metadata` (mismo índice). `agregados`
+    trae por ID_Político las sumas de COLUMNAS_INTERACCION y Posts_extraidos
+    de sus posts. Las tasas quedan a NaN si falta el año de comienzo o no es
+    anterior al de referencia, y la interacción si el político no tiene posts.
+    """
+    años = pd.Timestamp(fecha_referencia).year - _numerico(metadata["Comienzo en X/Twitter"])
+    seguidores = _numerico(metadata["Seguidores"])
+
+    por_politico = agregados.set_index(agregados["ID_Político"].astype(object)).reindex(
+        metadata["ID_Político"].astype(object)
+    )
+    suma = np.nansum(np.column_stack([_numerico(por_politico[col]) for col in COLUMNAS_INTERACCION]), axis=1)
+    interaccion = np.round(_dividir(suma, _numerico(por_politico["Posts_extraidos"])), 0)
+
+    return pd.DataFrame({
+        "Tasa_Posts_Año": np.round(_dividir(_numerico(metadata["Posts"]), años), 0),
+        "Tasa_Seguidores_Año": np.round(_dividir(seguidores, años), 0),
+        "Interacción": interaccion,
+        "Interacción_Relativa": _dividir(interaccion, seguidores),
+    }, index=metadata.index)
+
+
+@st.cache_data(show_spinner=False)
+def _metricas_version(version: str, fecha_referencia: str) -> pd.DataFrame:
+    metadata = cargar_columnas("Metadata", COLUMNAS_BRUTAS)
+    metricas = calcular_metricas(metadata, cargar_agregados("agregados_politico"), fecha_referencia)
+    metricas.index = metadata["ID_Político"].astype(object)
+    return metricas
+
+
+def metricas_derivadas(fecha_referencia: str = FECHA_REFERENCIA_METRICAS) -> pd.DataFrame:
+    """
+    Métricas derivadas de todos los políticos, indexadas por ID_Político,
+    calculadas una vez por versión de los datos y fecha de referencia.
+    """
+    return _metricas_version(obtener_version_datos(), str(fecha_referencia))
+
+
+def aplicar_metricas(df_metadata: pd.DataFrame, fecha_referencia: str = FECHA_REFERENCIA_METRICAS) -> pd.DataFrame:
+    """
+    Copia de df_metadata (cualquier selección de filas) con las columnas
+    derivadas sustituidas por las calculadas.
+    """
+    metricas = metricas_derivadas(fecha_referencia).reindex(df_metadata["ID_Político"].astype(object))
+    return df_metadata.assign(**{col: metricas[col].to_numpy() for col in COLUMNAS_DERIVADAS})
+
+
+def _dia(fecha) -> int:
+    return int(np.datetime64(pd.Timestamp(fecha).date(), "D").astype(np.int64))
+
+
+class InteraccionAcumulada:
+    """
+    Interacción por post (Likes + Retweets + Comentarios_Totales) con los
+    posts ordenados por (político, día). Cada post tiene la clave
+    código_político * amplitud + días desde el primer post, de modo que las
+    ventanas de todos los políticos se buscan a la vez en un único array
+    ordenado; las sumas de la ventana salen de la suma acumulada. Los posts
+    sin fecha válida no entran en ninguna ventana.
+    """
+
+    def __init__(self, posts: pd.DataFrame):
+        fechas = convertir_fechas(posts["Fecha_Publicación"])
+        codigos, self.ids = pd.factorize(posts["ID_Político"].astype(object))
+        validos = (fechas.notna() & (codigos >= 0)).to_numpy()
+        dias = fechas[validos].to_numpy().astype("datetime64[D]").astype(np.int64)
+        interaccion = np.nansum(
+            np.column_stack([_numerico(posts[col]) for col in COLUMNAS_INTERACCION]), axis=1
+        )[validos]
+
+        self.dia_inicial = int(dias.min()) if len(dias) else 0
+        self.amplitud = int(dias.max()) - self.dia_inicial + 1 if len(dias) else 1
+        claves = codigos[validos].astype(np.int64) * self.amplitud + (dias - self.dia_inicial)
+        orden = np.argsort(claves, kind="stable")
+        self.claves = claves[orden]
+        self.acumulada = np.concatenate(([0.0], np.cumsum(interaccion[orden])))
+
+    def limites(self) -> Optional[Tuple[datetime.date, datetime.date]]:
+        """
+        Primer y último día con posts (None si no hay ninguno con fecha).
+        """
+        if not len(self.claves):
+            return None
+        inicio = np.datetime64(self.dia_inicial, "D")
+        return inicio.item(), (inicio + np.timedelta64(self.amplitud - 1, "D")).item()
+
+    def ventana(self, desde, hasta) -> pd.DataFrame:
+        """
+        Interacción media por post y número de posts de cada político entre
+        `desde` y `hasta` (días incluidos), indexado por ID_Político. La
+        interacción es NaN para quienes no publicaron en la ventana.
+        """
+        inicio = np.clip(_dia(desde) - self.dia_inicial, 0, self.amplitud)
+        fin = np.clip(_dia(hasta) - self.dia_inicial, -1, self.amplitud - 1)
+        base = np.arange(len(self.ids), dtype=np.int64) * self.amplitud
+        izquierda = np.searchsorted(self.claves, base + inicio, side="left")
+        derecha = np.maximum(np.searchsorted(self.claves, base + fin, side="right"), izquierda)
+        n = derecha - izquierda
+        return pd.DataFrame({
+            "Interacción": np.round(_dividir(self.acumulada[derecha] - self.acumulada[izquierda], n.astype(float)), 0),
+            "Posts_ventana": n,
+        }, index=pd.Index(self.ids, name="ID_Político"))
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _interaccion_acumulada_version(version: str) -> InteraccionAcumulada:
+    return InteraccionAcumulada(
+        cargar_columnas("Posts", ["ID_Político", "Fecha_Publicación"] + COLUMNAS_INTERACCION)
+    )
+
+
+def interaccion_acumulada() -> InteraccionAcumulada:
+    """
+    Índice de interacción por político y fecha, construido una vez por
+    versión de los datos.
+    """
+    return _interaccion_acumulada_version(obtener_version_datos())
+
+
+def aplicar_ventana(df_metadata: pd.DataFrame, desde, hasta) -> pd.DataFrame:
+    """
+    Copia de df_metadata con Interacción e Interacción_Relativa calculadas
+    solo con los posts publicados entre `desde` y `hasta`.
+    """
+    ventana = interaccion_acumulada().ventana(desde, hasta).reindex(df_metadata["ID_Político"].astype(object))
+    interaccion = ventana["Interacción"].to_numpy(dtype=float)
+    return df_metadata.assign(**{
+        "Interacción": interaccion,
+        "Interacción_Relativa": _dividir(interaccion, _numerico(df_metadata["Seguidores"])),
+    })
+
+
+def validar_con_hoja(
+    df_metadata: pd.DataFrame,
+    metricas: pd.DataFrame,
+    tolerancias: Optional[Dict[str, float]] = None
+) -> pd.DataFrame:
+    """
+    Compara las métricas calculadas con las columnas de la hoja: por columna,
+    filas comparables (ambos valores presentes), discrepancias por encima de
+    la tolerancia, diferencia máxima y filas con valor solo en uno de los lados.
+    """
+    tolerancias = tolerancias or TOLERANCIAS
+    filas = []
+    for col in COLUMNAS_DERIVADAS:
+        if col not in df_metadata.columns:
+            continue
+        hoja = _numerico(df_metadata[col])
+        calculada = metricas[col].to_numpy(dtype=float)
+        ambos = ~np.isnan(hoja) & ~np.isnan(calculada)
+        diferencia = np.abs(hoja[ambos] - calculada[ambos])
+        filas.append({
+            "Métrica": col,
+            "Comparadas": int(ambos.sum()),
+            "Discrepancias": int((diferencia > tolerancias.get(col, 0)).sum()),
+            "Diferencia_máxima": float(diferencia.max()) if len(diferencia) else 0.0,
+            "Solo_en_un_lado": int((np.isnan(hoja) != np.isnan(calculada)).sum()),
+        })
+    return pd.DataFrame(filas)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Valida las métricas derivadas frente a la hoja de cálculo.")
+    parser.add_argument("--fecha", default=FECHA_REFERENCIA_METRICAS, help="fecha de referencia de las tasas")
+    args = parser.parse_args()
+
+    metadata = cargar_columnas("Metadata")
+    informe = validar_con_hoja(metadata, calcular_metricas(metadata, cargar_agregados("agregados_politico"), args.fecha))
+    print(informe.to_string(index=False))
+    return int(informe["Discrepancias"].sum() > 0)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
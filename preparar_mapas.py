@@ -0,0 +1,76 @@
+"""
+Paso de preparación (offline) de los mapas: genera GeoJSON ya reproyectado a
+EPSG:4326, con Canarias desplazada junto a la península, simplificado a varias
+resoluciones y con coordenadas cuantizadas.
+
+Uso: python preparar_mapas.py
+"""
+import json
+import os
+import numpy as np
+import geopandas as gpd
+import shapely
+from shapely import affinity
+from typing import Dict
+from config import RESOLUCIONES_MAPA, ruta_geojson
+
+RUTA_SHP_CCAA = "mapas/ComunidadesAutonomas_ETRS89_30N/Comunidades_Autonomas_ETRS89_30N.shp"
+
+# Tolerancia de simplificación (grados) por nivel de detalle (ver RESOLUCIONES_MAPA)
+NIVELES: Dict[str, float] = {
+    "alta": 0.001,
+    "media": 0.005,
+    "baja": 0.02,
+}
+DECIMALES = 4
+
+DESPLAZAMIENTO_CANARIAS = (550_000, 750_000)
+
+
+def desplazar_canarias(gdf: gpd.GeoDataFrame, columna: str = "Texto", valor: str = "Canarias") -> gpd.GeoDataFrame:
+    """
+    Traslada las geometrías de Canarias (en ETRS89 / UTM 30N) junto a la península.
+    """
+    gdf = gdf.copy()
+    mascara = gdf[columna] == valor
+    gdf.loc[mascara, "geometry"] = gdf.loc[mascara, "geometry"].apply(
+        lambda g: affinity.translate(g, *DESPLAZAMIENTO_CANARIAS)
+    )
+    return gdf
+
+
+def simplificar(gdf: gpd.GeoDataFrame, tolerancia: float, decimales: int = DECIMALES) -> gpd.GeoDataFrame:
+    """
+    Simplifica conservando las fronteras compartidas entre regiones vecinas
+    y redondea las coordenadas a `decimales` cifras.
+    """
+    gdf = gdf.copy()
+    geometrias = gdf.geometry.values
+    if hasattr(shapely, "coverage_simplify"):
+        geometrias = shapely.coverage_simplify(geometrias, tolerancia)
+    else:
+        geometrias = shapely.simplify(geometrias, tolerancia, preserve_topology=True)
+    gdf["geometry"] = shapely.transform(geometrias, lambda c: np.round(c, decimales))
+    return gdf
+
+
+def escribir_geojson(gdf: gpd.GeoDataFrame, ruta: str) -> None:
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(gdf.__geo_interface__, f, ensure_ascii=False, separators=(",", ":"))
+
+
+def preparar_ccaa() -> None:
+    """
+    Genera static/geojson/ccaa_<nivel>.geojson para cada nivel de NIVELES.
+    """
+    gdf = gpd.read_file(RUTA_SHP_CCAA)[["Codigo", "Texto", "geometry"]]
+    gdf = desplazar_canarias(gdf).to_crs(epsg=4326)
+    for nivel in RESOLUCIONES_MAPA:
+        ruta = ruta_geojson("ccaa", nivel)
+        escribir_geojson(simplificar(gdf, NIVELES[nivel]), ruta)
+        print(f"{ruta}: {os.path.getsize(ruta) / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    preparar_ccaa()
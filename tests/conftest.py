@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import almacen  # noqa: E402
+
+
+@pytest.fixture
+def almacen_temporal(tmp_path, monkeypatch):
+    """
+    Almacén vacío en un directorio temporal, para no tocar datasets/snapshot.
+    """
+    directorio = tmp_path / "snapshot"
+    monkeypatch.setattr(almacen, "DIR_SNAPSHOT", str(directorio))
+    return directorio
@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import almacen
+import ingesta
+
+POSTS = pd.DataFrame({
+    "ID_Político": ["a", "b", "a", "c", "b", "a"],
+    "Enlace_Post": [f"p{i}" for i in range(6)],
+    "Fecha_Publicación": [
+        "2024-03-02 10:00:00", "2024-01-15 09:30:00", "2024-03-01 08:00:00",
+        None, "2024-01-20 12:00:00", "2024-02-10 18:45:00",
+    ],
+    "Likes": [10, 0, 5, 7, 3, 1],
+    "Retweets": [1, 2, 0, 0, 4, 1],
+    "Comentarios_Totales": [0, 1, 2, 3, 0, 0],
+    "Tono": ["positivo", "Negativo", "Neutro", "Positivo", "neutro", "Negativo"],
+    "Tema": ["Economía", "Sanidad", "Economía", "Vivienda", "Sanidad", "Economía"],
+    "Corpus_Tokens": ["['paro', 'empleo']", "['hospital']", "[]", "['alquiler', 'paro']", "['hospital']", "['empleo']"],
+    "Entidades": ["['España']", "[]", "[]", "['Madrid']", "[]", "['España']"],
+})
+
+COMENTARIOS = pd.DataFrame({
+    "Enlace_Post": ["p0", "p0", "p1", "p4"],
+    "Fecha_Publicación": ["2024-03-02 11:00:00", "2024-03-03 11:00:00", "2024-01-16 10:00:00", "2024-01-21 10:00:00"],
+    "Tono": ["Positivo", "Negativo", "Neutro", "Neutro"],
+    "Tono_Respuesta": ["Neutro", "Neutro", "Positivo", "Negativo"],
+    "Corpus_Tokens_Comentarios": ["['bien']", "['mal']", "[]", "['hospital']"],
+    "Entidades_Comentarios": ["[]", "[]", "[]", "[]"],
+    "Corpus_Tokens_Respuestas": ["[]", "[]", "['gracias']", "[]"],
+    "Entidades_Respuestas": ["[]", "[]", "[]", "[]"],
+})
+
+NUEVOS_POSTS = pd.DataFrame({
+    "ID_Político": ["c", "a"],
+    "Enlace_Post": ["p6", "p7"],
+    "Fecha_Publicación": ["2024-04-01 10:00:00", "2024-03-15 10:00:00"],
+    "Likes": [100, 20],
+    "Retweets": [10, 2],
+    "Comentarios_Totales": [1, 1],
+    "Tono": ["Positivo", "Positivo"],
+    "Tema": ["Vivienda", "Economía"],
+    "Corpus_Tokens": ["['vivienda', 'paro']", "['empleo']"],
+    "Entidades": ["[]", "['Europa']"],
+})
+
+
+def _ingerir(tmp_path):
+    rutas = {"posts": tmp_path / "posts.csv", "comentarios": tmp_path / "comentarios.jsonl", "metadata": tmp_path / "metadata.csv"}
+    POSTS.to_csv(rutas["posts"], index=False)
+    COMENTARIOS.to_json(rutas["comentarios"], orient="records", lines=True, force_ascii=False)
+    pd.DataFrame({"ID_Político": ["a", "b", "c"], "Nombre": ["Ana", "Blas", "Carla"]}).to_csv(rutas["metadata"], index=False)
+    return ingesta.ingerir_en_flujo(str(rutas["posts"]), str(rutas["comentarios"]), str(rutas["metadata"]), tamaño_lote=4)
+
+
+def _por_mes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Orden de filas esperado en el almacén: por mes (sin fecha al final) y,
+    dentro de cada mes, el de escritura.
+    """
+    meses = pd.to_datetime(df["Fecha_Publicación"]).dt.strftime("%Y-%m").fillna(almacen.SIN_FECHA)
+    return df.iloc[np.argsort(meses.to_numpy(), kind="stable")].reset_index(drop=True)
+
+
+def _tokens(tabla: pa.Table, col: str) -> list:
+    vocabulario = almacen.leer_vocabulario()
+    return [[vocabulario[i] for i in fila] for fila in tabla[col].to_pylist()]
+
+
+def test_particionado_ordena_por_mes_y_conserva_el_orden_de_escritura(almacen_temporal):
+    df = POSTS[["Enlace_Post", "Fecha_Publicación", "Likes"]]
+    almacen.escribir_particionado(
+        pa.Table.from_pandas(df, preserve_index=False), "Posts", almacen.mes_particion(df["Fecha_Publicación"])
+    )
+
+    leida = almacen.leer_tabla("Posts").to_pandas()
+    pd.testing.assert_frame_equal(leida, _por_mes(df))
+    assert [p.split("/")[-2] for p in almacen.partes_tabla("Posts")] == ["2024-01", "2024-02", "2024-03", "sin_fecha"]
+
+
+def test_ingesta_en_flujo_guarda_hojas_tokens_y_agregados(almacen_temporal, tmp_path):
+    assert _ingerir(tmp_path) == {"Posts": 6, "Comentarios": 4}
+
+    esperado = _por_mes(POSTS)
+    posts = almacen.leer_tabla("Posts")
+    assert posts.column("Enlace_Post").to_pylist() == esperado["Enlace_Post"].tolist()
+    assert _tokens(posts, "Corpus_Tokens") == [ingesta.parsear_lista(v) for v in esperado["Corpus_Tokens"]]
+    assert almacen.leer_tabla("Comentarios").num_rows == len(COMENTARIOS)
+
+    agregados = almacen.leer_tabla("agregados_politico").to_pandas().set_index("ID_Político").sort_index()
+    sumas = POSTS.groupby("ID_Político")[["Likes", "Retweets", "Comentarios_Totales"]].sum()
+    pd.testing.assert_frame_equal(agregados[sumas.columns], sumas, check_dtype=False)
+    assert agregados["Posts_extraidos"].tolist() == POSTS["ID_Político"].value_counts().sort_index().tolist()
+    tonos = pd.crosstab(POSTS["ID_Político"], POSTS["Tono"].str.capitalize()).add_prefix(ingesta.PREFIJO_TONO)
+    pd.testing.assert_frame_equal(agregados[tonos.columns], tonos, check_dtype=False, check_names=False)
+
+
+def test_anexar_solo_escribe_partes_nuevas_y_suma_el_delta(almacen_temporal, tmp_path):
+    _ingerir(tmp_path)
+    antes = almacen.estado_partes("Posts")
+    manifiesto = almacen.leer_manifiesto()
+    n_vocabulario = len(almacen.leer_vocabulario())
+
+    assert ingesta.anexar(posts=NUEVOS_POSTS) == {"Posts": 2}
+
+    despues = almacen.estado_partes("Posts")
+    assert {parte: despues[parte] for parte in antes} == antes
+    assert len(despues) == len(antes) + 2
+    assert almacen.leer_manifiesto()["sha256"] != manifiesto["sha256"]
+    assert almacen.leer_manifiesto()["anexos"] == 1
+    assert len(almacen.leer_vocabulario()) == n_vocabulario + 2  # vivienda, Europa
+
+    todos = pd.concat([POSTS, NUEVOS_POSTS], ignore_index=True)
+    todos["Tono"] = todos["Tono"].str.capitalize()
+    posts = almacen.leer_tabla("Posts")
+    assert sorted(posts.column("Enlace_Post").to_pylist()) == sorted(todos["Enlace_Post"])
+    assert sorted(map(tuple, _tokens(posts, "Entidades"))) == sorted(
+        tuple(ingesta.parsear_lista(v)) for v in todos["Entidades"]
+    )
+
+    agregados = almacen.leer_tabla("agregados_politico").to_pandas().set_index("ID_Político").sort_index()
+    interaccion = todos.groupby("ID_Político")[["Likes", "Retweets", "Comentarios_Totales"]].sum().sum(axis=1)
+    assert agregados["Interacción"].tolist() == (interaccion / todos.groupby("ID_Político").size()).round(0).tolist()
+
+    temas = almacen.leer_tabla("agregados_tema").to_pandas().set_index(ingesta.CLAVES_TEMA)["Posts"].sort_index()
+    esperado = todos.groupby(ingesta.CLAVES_TEMA).size().sort_index()
+    assert temas.to_dict() == esperado.to_dict()
+
+
+def test_anexar_sin_filas_no_cambia_la_version(almacen_temporal, tmp_path):
+    _ingerir(tmp_path)
+    manifiesto = almacen.leer_manifiesto()
+    assert ingesta.anexar(posts=NUEVOS_POSTS.iloc[:0]) == {}
+    assert almacen.leer_manifiesto() == manifiesto
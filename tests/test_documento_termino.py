@@ -0,0 +1,81 @@
+import ast
+
+import numpy as np
+import pandas as pd
+
+from ingesta import ColumnaTokens, codificar_tokens
+from analisis_en_profundidad.documento_termino import MatrizDocumentoTermino
+
+TOKENS = pd.Series([
+    "['voto', 'ley', 'voto']",
+    "[]",
+    "['ley', 'paro']",
+    None,
+    "['paro', 'voto', 'ciencia', 'ley']",
+    "['ciencia']",
+    "['voto', 'paro', 'paro']",
+    "['ley', 'ciencia', 'voto']",
+])
+GRUPOS = np.array([0, 2, 1, 0, -1, 1, 0, 2])
+
+
+def _matriz() -> MatrizDocumentoTermino:
+    vocabulario, codificadas = codificar_tokens({"Corpus_Tokens": TOKENS})
+    ids, offsets = codificadas["Corpus_Tokens"]
+    return MatrizDocumentoTermino(ColumnaTokens(ids, offsets, vocabulario))
+
+
+def _listas() -> pd.Series:
+    return TOKENS.map(lambda valor: ast.literal_eval(valor) if isinstance(valor, str) else [])
+
+
+def test_ids_de_filas_en_orden():
+    matriz = _matriz()
+    filas = np.array([6, 0, 3, 4])
+    tokens = matriz.vocabulario[matriz.columna.ids_de_filas(filas)].tolist()
+    assert tokens == [token for fila in filas for token in _listas()[fila]]
+    assert len(matriz.columna.ids_de_filas(np.array([1, 3]))) == 0
+
+
+def test_sumar_columnas_y_top_como_value_counts():
+    matriz = _matriz()
+    filas = np.array([0, 2, 4, 5, 6])
+    frecuencias = matriz.sumar_columnas(filas)
+    esperado = _listas().iloc[filas].explode().dropna().value_counts()
+
+    assert dict(zip(matriz.vocabulario, frecuencias)) == {
+        token: int(esperado.get(token, 0)) for token in matriz.vocabulario
+    }
+    # Mayor a menor y, en los empates, orden del vocabulario
+    posicion = {token: i for i, token in enumerate(matriz.vocabulario)}
+    ordenado = sorted(esperado.items(), key=lambda par: (-par[1], posicion[par[0]]))
+    assert matriz.top(frecuencias, 10) == ordenado
+    assert matriz.top(frecuencias, 2) == ordenado[:2]
+    # Los términos con frecuencia 0 no aparecen
+    assert matriz.top(matriz.sumar_columnas(np.array([5])), 10) == [("ciencia", 1)]
+
+
+def test_sumar_por_grupo_como_groupby():
+    matriz = _matriz()
+    filas = np.arange(len(TOKENS))
+    indptr, terminos, frecuencias = matriz.sumar_por_grupo(filas, GRUPOS, 3)
+    esperado = (
+        pd.DataFrame({"Grupo": GRUPOS, "Token": _listas()})
+        .query("Grupo >= 0").explode("Token").dropna()
+        .groupby(["Grupo", "Token"]).size()
+    )
+
+    assert indptr.tolist()[0] == 0 and len(indptr) == 4
+    obtenido = {}
+    for grupo in range(3):
+        tramo = slice(indptr[grupo], indptr[grupo + 1])
+        # Términos de cada grupo en orden de vocabulario
+        assert np.all(np.diff(terminos[tramo]) > 0)
+        for termino, frecuencia in zip(terminos[tramo], frecuencias[tramo]):
+            obtenido[(grupo, matriz.vocabulario[termino])] = int(frecuencia)
+    assert obtenido == esperado.to_dict()
+
+    # top sobre el tramo disperso de un grupo coincide con el vector denso
+    tramo = slice(indptr[0], indptr[1])
+    denso = matriz.sumar_columnas(filas[GRUPOS == 0])
+    assert matriz.top(frecuencias[tramo], 3, terminos[tramo]) == matriz.top(denso, 3)
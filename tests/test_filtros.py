@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+from filtros import IndiceFiltros
+
+METADATA = pd.DataFrame({
+    "Partido": ["PP", "PSOE", "PP", "Vox", "PSOE", "Sumar", "PP", None],
+    "Género": ["M", "H", "H", "H", "M", "M", "M", "H"],
+    "Edad": [45, 52, np.nan, 38, 61, 29, 45, 50],
+    "Seguidores": [1000, 25000, 300, 12000, 800, 45000, 1000, 5],
+    "Posts_extraidos": [10, 3, 0, 7, 2, 15, 1, 4],
+})
+
+
+def _mascara(indice: IndiceFiltros, bits: np.ndarray) -> np.ndarray:
+    return np.unpackbits(bits, count=indice.n).astype(bool)
+
+
+def test_por_valores_equivale_a_isin():
+    indice = IndiceFiltros(METADATA, ("Partido", "Género"))
+    bits = indice.por_valores("Partido", ["PP", "Vox", "Inexistente"])
+    assert (_mascara(indice, bits) == METADATA["Partido"].isin(["PP", "Vox"]).to_numpy()).all()
+    assert not _mascara(indice, indice.por_valores("Partido", [])).any()
+
+
+def test_combinacion_de_filtros_equivale_a_las_mascaras_de_pandas():
+    indice = IndiceFiltros(METADATA, ("Partido", "Género", "Edad", "Seguidores"))
+    seleccion = (
+        indice.por_valores("Partido", ["PP", "PSOE"])
+        & indice.por_valores("Género", ["M"])
+        & indice.por_rango("Edad", 40, 60)
+        & indice.por_rango("Seguidores", 500, 30000)
+    )
+    esperado = METADATA[
+        METADATA["Partido"].isin(["PP", "PSOE"])
+        & (METADATA["Género"] == "M")
+        & METADATA["Edad"].between(40, 60)
+        & METADATA["Seguidores"].between(500, 30000)
+    ]
+    assert indice.filas(seleccion).tolist() == list(esperado.index)
+
+
+def test_rango_descarta_nulos_y_respeta_limites_inclusivos():
+    indice = IndiceFiltros(METADATA, ("Edad",))
+    filas = indice.filas(indice.por_rango("Edad", 45, 52))
+    assert filas.tolist() == list(METADATA.index[METADATA["Edad"].between(45, 52)])
+    assert indice.filas(indice.por_rango("Edad", 0, 200)).tolist() == list(METADATA.index[METADATA["Edad"].notna()])
+
+
+def test_extremos_y_valores_de_la_seleccion():
+    indice = IndiceFiltros(METADATA, ("Partido", "Seguidores"))
+    seleccion = indice.por_valores("Partido", ["PSOE", "Sumar"])
+    subconjunto = METADATA[METADATA["Partido"].isin(["PSOE", "Sumar"])]
+    assert indice.extremos("Seguidores", seleccion) == (subconjunto["Seguidores"].min(), subconjunto["Seguidores"].max())
+    assert indice.extremos("Seguidores", indice.por_valores("Partido", [])) is None
+    assert sorted(indice.valores("Partido", indice.por_rango("Seguidores", 0, 1000))) == sorted(
+        METADATA.loc[METADATA["Seguidores"] <= 1000, "Partido"].dropna().unique()
+    )
+
+
+def test_conteos_por_bits_y_cubo_coinciden_con_groupby():
+    indice = IndiceFiltros(METADATA.drop(columns="Edad"), ("Partido", "Género", "Seguidores"))
+    seleccion = indice.por_valores("Género", ["M"])
+    subconjunto = METADATA[METADATA["Género"] == "M"]
+    esperado = {
+        partido: (len(grupo), int(grupo["Posts_extraidos"].sum()))
+        for partido, grupo in subconjunto.groupby("Partido")
+    }
+    assert indice.conteos("Partido", seleccion) == esperado
+    assert indice.cubo.conteos("Partido", {"Género": ["M"]}) == esperado
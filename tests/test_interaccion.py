@@ -0,0 +1,49 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from metricas import COLUMNAS_INTERACCION, InteraccionAcumulada
+
+POSTS = pd.DataFrame({
+    "ID_Político": ["a", "b", "a", "c", "b", "a", "c", "b"],
+    "Fecha_Publicación": [
+        "2024-01-01 10:00:00", "2024-01-03 09:00:00", "2024-01-05 23:59:00", "2024-01-05 00:00:00",
+        None, "2024-02-01 12:00:00", "2024-01-20 08:00:00", "2024-01-31 18:00:00",
+    ],
+    "Likes": [10, 4, 6, np.nan, 100, 1, 9, 2],
+    "Retweets": [1, 0, 2, 3, 50, 0, 1, 1],
+    "Comentarios_Totales": [0, 2, 1, 1, 20, 0, 0, 3],
+})
+
+
+def _esperado(desde: str, hasta: str) -> pd.DataFrame:
+    fechas = pd.to_datetime(POSTS["Fecha_Publicación"]).dt.normalize()
+    ventana = POSTS[fechas.between(pd.Timestamp(desde), pd.Timestamp(hasta))]
+    suma = ventana[COLUMNAS_INTERACCION].sum(axis=1)
+    grupos = suma.groupby(ventana["ID_Político"])
+    ids = pd.Index(["a", "b", "c"], name="ID_Político")
+    return pd.DataFrame({
+        "Interacción": (grupos.sum() / grupos.size()).round(0).reindex(ids),
+        "Posts_ventana": grupos.size().reindex(ids, fill_value=0),
+    })
+
+
+@pytest.mark.parametrize("desde, hasta", [
+    ("2024-01-01", "2024-12-31"),
+    ("2024-01-05", "2024-01-05"),
+    ("2024-01-02", "2024-01-31"),
+    ("2023-01-01", "2023-12-31"),
+    ("2024-02-02", "2024-03-01"),
+])
+def test_ventana_equivale_a_filtrar_y_agrupar(desde, hasta):
+    ventana = InteraccionAcumulada(POSTS).ventana(desde, hasta).sort_index()
+    esperado = _esperado(desde, hasta)
+    np.testing.assert_array_equal(ventana["Interacción"].to_numpy(), esperado["Interacción"].to_numpy())
+    np.testing.assert_array_equal(ventana["Posts_ventana"].to_numpy(), esperado["Posts_ventana"].to_numpy())
+
+
+def test_limites_ignoran_posts_sin_fecha():
+    assert InteraccionAcumulada(POSTS).limites() == (datetime.date(2024, 1, 1), datetime.date(2024, 2, 1))
+    assert InteraccionAcumulada(POSTS.iloc[[4]]).limites() is None
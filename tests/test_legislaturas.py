@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+from filtros import IndiceFiltros, MatrizPertenencia
+
+LEGISLATURAS = pd.Series(
+    ["X, XI, XII", "XIV", "XI", None, "XII,XIV", "", "X, XIV, XI", "XIII"],
+    index=[10, 11, 12, 13, 14, 15, 16, 17],
+)
+
+
+def _conjuntos(serie: pd.Series) -> list:
+    return [
+        {v.strip() for v in valor.split(",") if v.strip()} if isinstance(valor, str) else set()
+        for valor in serie
+    ]
+
+
+def test_pertenencia_exacta_por_elemento():
+    matriz = MatrizPertenencia(LEGISLATURAS, ",")
+    conjuntos = _conjuntos(LEGISLATURAS)
+    assert set(matriz.valores) == set().union(*conjuntos)
+    for valor in matriz.valores:
+        esperadas = [i for i, conjunto in enumerate(conjuntos) if valor in conjunto]
+        assert matriz.filas(valor).tolist() == esperadas
+    assert matriz.filas("XV").tolist() == []
+
+
+def test_alguna_o_todas_las_legislaturas():
+    df = pd.DataFrame({"Rango_Legislaturas": LEGISLATURAS})
+    indice = IndiceFiltros(df, ("Rango_Legislaturas",))
+    conjuntos = _conjuntos(LEGISLATURAS)
+    elegidas = {"XI", "XIV"}
+
+    alguna = indice.filas(indice.por_valores("Rango_Legislaturas", sorted(elegidas)))
+    todas = indice.filas(indice.por_valores("Rango_Legislaturas", sorted(elegidas), todos=True))
+
+    assert alguna.tolist() == [i for i, c in enumerate(conjuntos) if c & elegidas]
+    assert todas.tolist() == [i for i, c in enumerate(conjuntos) if elegidas <= c]
+    # La selección son posiciones: las etiquetas salen de df.index
+    assert list(df.index[todas]) == [16]
+    assert not np.any(indice.por_valores("Rango_Legislaturas", ["XV"], todos=True))
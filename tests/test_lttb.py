@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analisis_en_profundidad.series_temporales import lttb, submuestrear
+
+
+def _lttb_referencia(x: np.ndarray, y: np.ndarray, puntos: int) -> list:
+    # Largest-triangle-three-buckets punto a punto; el tramo i son las
+    # posiciones [1 + i * (n - 2) / (puntos - 2), 1 + (i + 1) * (n - 2) / (puntos - 2))
+    n = len(y)
+    borde = lambda i: 1 + i * (n - 2) // (puntos - 2)
+    elegidos, a = [0], 0
+    for i in range(puntos - 2):
+        inicio, fin = borde(i), borde(i + 1)
+        siguiente = min(borde(i + 2), n)
+        media_x = sum(x[fin:siguiente]) / (siguiente - fin)
+        media_y = sum(y[fin:siguiente]) / (siguiente - fin)
+        mejor, area_mejor = inicio, -1.0
+        for j in range(inicio, fin):
+            area = abs((x[a] - media_x) * (y[j] - y[a]) - (x[a] - x[j]) * (media_y - y[a]))
+            if area > area_mejor:
+                mejor, area_mejor = j, area
+        elegidos.append(mejor)
+        a = mejor
+    return elegidos + [n - 1]
+
+
+@pytest.mark.parametrize("n, puntos", [(5000, 600), (1000, 3), (997, 50), (101, 100)])
+def test_lttb_extremos_y_presupuesto(n, puntos):
+    rng = np.random.default_rng(n)
+    x = np.cumsum(rng.integers(1, 4, n)).astype(float)
+    y = rng.poisson(5, n).astype(float)
+    y[n // 3], y[2 * n // 3] = 200, -50
+
+    elegidos = lttb(x, y, puntos)
+
+    assert len(elegidos) == puntos
+    assert elegidos[0] == 0 and elegidos[-1] == n - 1
+    assert np.all(np.diff(elegidos) > 0)
+    assert elegidos.tolist() == _lttb_referencia(x.tolist(), y.tolist(), puntos)
+    if puntos >= 50:
+        assert n // 3 in elegidos and 2 * n // 3 in elegidos
+
+
+@pytest.mark.parametrize("n, puntos", [(10, 600), (10, 10), (10, 2), (0, 5)])
+def test_lttb_sin_reducir(n, puntos):
+    assert lttb(np.arange(n), np.ones(n), puntos).tolist() == list(range(n))
+
+
+def test_submuestrear_por_grupo():
+    rng = np.random.default_rng(0)
+    fechas = pd.date_range("2015-01-01", periods=500)
+    df = pd.concat([
+        pd.DataFrame({"Fecha": fechas, "Partido": "A", "Cantidad": rng.poisson(5, 500)}),
+        pd.DataFrame({"Fecha": fechas[:40], "Partido": "B", "Cantidad": rng.poisson(5, 40)}),
+        pd.DataFrame({"Fecha": fechas[100:400], "Partido": "C", "Cantidad": rng.poisson(5, 300)}),
+    ], ignore_index=True)
+
+    reducido = submuestrear(df, "Fecha", "Cantidad", ["Partido"], 60)
+
+    assert reducido.index.is_monotonic_increasing
+    por_grupo = reducido.groupby("Partido")
+    assert por_grupo.size().to_dict() == {"A": 60, "B": 40, "C": 60}
+    extremos = df.groupby("Partido")["Fecha"].agg(["min", "max"])
+    assert por_grupo["Fecha"].agg(["min", "max"]).equals(extremos)
+    # Cada fila conservada es una fila original sin modificar
+    assert reducido.equals(df.loc[reducido.index])
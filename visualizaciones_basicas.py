@@ -1,7 +1,12 @@
 import streamlit as st
 import plotly.express as px
 import pandas as pd
-from config import COLOR_PARTIDOS, generar_paleta
+import numpy as np
+from typing import Optional, Tuple
+from config import COLOR_PARTIDOS, PIXELES_POR_PUNTO, generar_paleta
+from analisis_en_profundidad.series_temporales import (
+    AUTOR_DESCONOCIDO, FRECUENCIAS, serie_actividad, submuestrear
+)
 
 __all__ = [
     "mostrar_graficos_basicos",
@@ -50,41 +55,92 @@ def mostrar_graficos_basicos(df: pd.DataFrame, tipo: str, columnas: list):
 
 
 
-@st.cache_data
-def preparar_actividad_temporal(df_posts: pd.DataFrame, df_comentarios: pd.DataFrame) -> pd.DataFrame:
+def preparar_actividad_temporal(
+    df_metadata: pd.DataFrame,
+    frecuencia: str,
+    desglose: str,
+    rango: Optional[Tuple] = None
+) -> pd.DataFrame:
     """
-    Prepara el dataframe de actividad temporal para ser graficado,
-    utilizando cache para no recalcularlo en cada recarga.
+    Posts y comentarios recibidos por los políticos seleccionados en cada
+    periodo de `frecuencia` ("D", "W" o "M"), en total o por partido
+    (`desglose`). Se suman sus filas de la serie diaria de actividad, solo en
+    los días de `rango` (desde, hasta) si se indica. Sin filtros (están todos
+    los políticos de Metadata) se incluyen también los comentarios a posts
+    que no están en la hoja Posts: en el total o, por partido, como
+    AUTOR_DESCONOCIDO.
     """
-    posts_fecha = (
-        pd.to_datetime(df_posts["Fecha_Publicación"], errors='coerce')
-        .dt.date.value_counts()
-        .sort_index()
-    )
-    comentarios_fecha = (
-        pd.to_datetime(df_comentarios["Fecha_Publicación"], errors='coerce')
-        .dt.date.value_counts()
-        .sort_index()
-    )
+    serie = serie_actividad()
+    tramo = serie.tramo(*rango) if rango else slice(None)
+    filas = serie.filas(df_metadata["ID_Político"])
+    if desglose == "Partido":
+        codigos, grupos = pd.factorize(df_metadata["Partido"], sort=True)
+        grupos = list(grupos)
+    else:
+        codigos, grupos = np.zeros(len(filas), dtype=np.int64), ["Total"]
+    codigos = np.asarray(codigos)
+    desconocida = serie.fila_desconocida
+    if len(df_metadata) == len(serie.ids) and serie.conteos[desconocida].any():
+        if desglose == "Partido":
+            grupos.append(AUTOR_DESCONOCIDO)
+        filas, codigos = np.append(filas, desconocida), np.append(codigos, len(grupos) - 1)
+    grupos = np.asarray(grupos, dtype=object)
+
+    fechas, conteos = serie.remuestrear(serie.sumar(filas, codigos, len(grupos), tramo), frecuencia, tramo)
+    grupo, periodo, tipo = np.indices(conteos.shape).reshape(3, -1)
     df_plot = pd.DataFrame({
-        "Fecha": list(posts_fecha.index) + list(comentarios_fecha.index),
-        "Cantidad": list(posts_fecha.values) + list(comentarios_fecha.values),
-        "Tipo": ["Posts"] * len(posts_fecha) + ["Comentarios"] * len(comentarios_fecha)
+        "Fecha": fechas[periodo],
+        "Cantidad": conteos.ravel(),
+        "Tipo": np.asarray(serie.categorias, dtype=object)[tipo],
     })
+    if desglose == "Partido":
+        df_plot["Partido"] = grupos[grupo]
     return df_plot
 
 
-def mostrar_actividad_temporal(df_posts: pd.DataFrame, df_comentarios: pd.DataFrame):
+def mostrar_actividad_temporal(df_metadata: pd.DataFrame):
     """
-    Visualiza la evolución temporal de posts y comentarios.
+    Visualiza la evolución temporal de posts y comentarios de los políticos
+    filtrados. El rango de fechas vuelve a sumar la serie a resolución
+    completa solo en ese tramo; lo que se envía al navegador se reduce con
+    LTTB a un punto cada PIXELES_POR_PUNTO píxeles de ancho.
     """
     st.markdown("---")
     st.subheader("📆 Actividad por Fecha (Posts y Comentarios)")
 
+    col_periodo, col_desglose = st.columns(2)
+    frecuencia = col_periodo.selectbox("Periodo", list(FRECUENCIAS), key="actividad_frecuencia")
+    desglose = col_desglose.selectbox("Desglose", ["Total", "Partido"], key="actividad_desglose")
+    dias = serie_actividad().dias()
+    if not len(dias):
+        st.info("No hay actividad con fecha.")
+        return
+    rango = st.slider(
+        "Rango de fechas",
+        min_value=dias[0].date(),
+        max_value=dias[-1].date(),
+        value=(dias[0].date(), dias[-1].date()),
+        key="actividad_rango"
+    )
+
+    ancho = 1200
     try:
-        df_plot = preparar_actividad_temporal(df_posts, df_comentarios)
-        fig = px.line(df_plot, x="Fecha", y="Cantidad", color="Tipo", title="Evolución temporal de actividad")
-        fig.update_layout(width=1200, height=500)
+        df_plot = preparar_actividad_temporal(df_metadata, FRECUENCIAS[frecuencia], desglose, rango)
+        if df_plot.empty:
+            st.info("No hay actividad con fecha para la selección actual.")
+            return
+        grupos = ["Partido", "Tipo"] if desglose == "Partido" else ["Tipo"]
+        df_plot = submuestrear(df_plot, "Fecha", "Cantidad", grupos, ancho // PIXELES_POR_PUNTO)
+        if desglose == "Partido":
+            fig = px.line(
+                df_plot, x="Fecha", y="Cantidad", color="Partido", facet_row="Tipo",
+                color_discrete_map=COLOR_PARTIDOS, title="Evolución temporal de actividad por partido"
+            )
+            fig.update_yaxes(matches=None)
+            fig.update_layout(width=ancho, height=700)
+        else:
+            fig = px.line(df_plot, x="Fecha", y="Cantidad", color="Tipo", title="Evolución temporal de actividad")
+            fig.update_layout(width=ancho, height=500)
         st.plotly_chart(fig)
     except Exception as e:
         st.warning(f"No se pudo generar la serie temporal: {e}")